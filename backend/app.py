@@ -1,48 +1,118 @@
-from flask import Flask
-from flask import jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
-from asgiref.wsgi import WsgiToAsgi
-from utils.config import ProductionConfig, DevelopmentConfig
-from flask_cors import CORS
-
 import os
-app = Flask(__name__)
-app.config.from_object(
-    ProductionConfig if os.getenv('FLASK_ENV') == 'production' else DevelopmentConfig
-)
-
-# Flask‑JWT‑Extended picks up that JWT_SECRET_KEY from app.config.
+import logging
 
 allowed_origins = [
     "http://localhost:5173"
 ]
 
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
 
-# Without calling JWTManager(app) (or equivalently jwt.init_app(app)), your app would know the secret key,
-# but none of the machinery that actually creates, verifies, or enforces JWTs would be registered.
+def create_app(config=None):
+    """Build the Flask app.
+
+    `config` is a config class (default: ProductionConfig / DevelopmentConfig
+    from FLASK_ENV) or a dict of settings applied on top of the default one.
+    Nothing here touches the database: the engine is built on first use and
+    the schema is brought up to date by `flask db upgrade` (or AUTO_MIGRATE=1).
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from flask import Flask, jsonify
+    from flask_cors import CORS
+    from utils.config import ProductionConfig, DevelopmentConfig
+    from utils.extensions import engine, jwt, shards
+
+    default = ProductionConfig if os.getenv('FLASK_ENV') == 'production' else DevelopmentConfig
+    app = Flask(__name__)
+    app.config.from_object(config if config is not None and not isinstance(config, dict) else default)
+    if isinstance(config, dict):
+        app.config.update(config)
+
+    logging.basicConfig(
+        level=app.config["LOG_LEVEL"],
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+
+    # Flask‑JWT‑Extended picks up that JWT_SECRET_KEY from app.config.
+    jwt.init_app(app)
+    engine.configure(app.config)
+    shards.configure(app.config)
+
+    if app.config["AUTO_MIGRATE"]:
+        from utils.migrations import upgrade_blocking
+        for database in shards.databases():
+            upgrade_blocking(database)  # brings the schema up to the latest migrations/ step
+
+    from routes.auth_route import auth_bp
+    from routes.expense_route import expense_bp
+
+    CORS(app, origins = allowed_origins, supports_credentials=True)
+
+    from sqlalchemy.engine import make_url
+    logging.getLogger(__name__).info(
+        "database %s", make_url(app.config["SQLALCHEMY_DATABASE_URI"]).render_as_string(hide_password=True)
+    )
+
+    @app.route('/hola')
+    def index():
+        return jsonify(msg="Hola amigos"), 200
+
+    if app.config["PROFILE_ENABLED"]:
+        # first, so the profile spans the other before / after_request hooks too
+        from utils.profiler import install_profiler
+        install_profiler(app)
+
+    if app.config["METRICS_ENABLED"]:
+        from utils.metrics import instrument_app, instrument_engine, metrics_response
+        instrument_app(app)
+        shards.on_create(instrument_engine)   # the main engine and every shard's
+
+        @app.route('/metrics')
+        def metrics():
+            return metrics_response()
 
-import models
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(expense_bp, url_prefix='/api/expense')
 
-with app.app_context():
-    db.create_all() 
+    from commands import register_commands
+    register_commands(app)
 
-from routes.auth_route import auth_bp
-from routes.expense_route import expense_bp
+    if app.config["ALERT_DISPATCHER_ENABLED"]:
+        from utils.alert_dispatcher import AlertDispatcher
+        dispatcher = app.extensions['alert_dispatcher'] = AlertDispatcher(app.config)
 
-CORS(app, origins = allowed_origins, supports_credentials=True)
+        # started by the first request rather than here, so CLI processes
+        # (flask db upgrade, ...) never run it next to their own work
+        @app.before_request
+        def start_alert_dispatcher():
+            if not dispatcher.started:
+                dispatcher.start()
 
-print(app.config["SQLALCHEMY_DATABASE_URI"])
+    if app.config["PERSISTENT_EVENT_LOOP"]:
+        from utils.event_loop import PersistentLoop, PersistentLoopASGI
+        persistent_loop = app.extensions['persistent_loop'] = PersistentLoop()
+        app.async_to_sync = persistent_loop.async_to_sync   # every async view runs on that loop
+        app.extensions['asgi_app'] = PersistentLoopASGI(app, persistent_loop, max_threads=app.config["SERVER_THREADS"])
+    else:
+        from asgiref.wsgi import WsgiToAsgi
+        app.extensions['asgi_app'] = WsgiToAsgi(app)
+        if app.config["GROUP_COMMIT_ENABLED"]:
+            logging.getLogger(__name__).warning(
+                "GROUP_COMMIT_ENABLED needs PERSISTENT_EVENT_LOOP=1; every create commits on its own"
+            )
 
-@app.route('/hola')
-def index():
-    return jsonify(msg="Hola amigos"), 200
+    return app
 
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(expense_bp, url_prefix='/api/expense')
 
-asgi_app = WsgiToAsgi(app)
+def __getattr__(name):
+    # `app` / `asgi_app` are built on first access, so `import app` stays cheap
+    # and `uvicorn app:asgi_app`, `flask --app app` and `from app import app` keep working
+    if name in ('app', 'asgi_app'):
+        built = globals().get('app')
+        if built is None:
+            built = globals()['app'] = create_app()
+            globals()['asgi_app'] = built.extensions['asgi_app']
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # pipenv run uvicorn app:asgi_app --reload
@@ -0,0 +1,53 @@
+# benchmarks/bench_auth.py
+"""Per-request cost of protectRoute with and without the verified-token cache."""
+import asyncio
+import sys
+import time
+from benchmarks.common import emit, login, parser, quiet, use_scratch_database
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument('--requests', type=int, default=20000)
+    args = p.parse_args()
+
+    use_scratch_database('auth')
+    stdout = quiet()
+    from app import app
+    from middlewares.auth_middleware import protectRoute
+    from utils.token_cache import get_token_cache
+
+    headers = login(app.test_client(), 'bench_auth')
+
+    @protectRoute
+    async def noop():
+        return "ok"
+
+    def run(cache_size):
+        app.extensions.pop('token_cache', None)
+        app.config['TOKEN_CACHE_SIZE'] = cache_size
+        with app.test_request_context('/api/expense/recent', headers=headers):
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(noop())            # warm-up (fills the cache)
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                loop.run_until_complete(noop())
+            elapsed = time.perf_counter() - started
+            loop.close()
+        return round(elapsed / args.requests * 1e6, 2)   # microseconds per request
+
+    uncached = run(0)
+    cached = run(10000)
+    assert len(get_token_cache(app)) == 1
+
+    sys.stdout = stdout
+    emit({
+        'benchmark': 'auth',
+        'requests': args.requests,
+        'us_per_request': {'full_verify': uncached, 'cached': cached},
+        'speedup': round(uncached / cached, 1),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
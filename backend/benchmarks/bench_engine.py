@@ -0,0 +1,113 @@
+# benchmarks/bench_engine.py
+"""Concurrent write/read throughput for different engine settings.
+
+Each scenario gets a fresh SQLite file and runs `--writers` tasks inserting
+expenses (with their rollup/balance deltas, like create_expense) next to
+`--readers` tasks running the dashboard query, all through
+utils.extensions.create_engine_from_config.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+from benchmarks.common import emit, parser, percentiles, use_scratch_database
+
+SCENARIOS = {
+    # what the app did before: no pragmas (rollback journal, synchronous=FULL), 5+10 pool
+    'sqlite_defaults': dict(SQLITE_JOURNAL_MODE='DELETE', SQLITE_SYNCHRONOUS='FULL',
+                            SQLITE_BUSY_TIMEOUT_MS='', SQLITE_MMAP_SIZE='',
+                            DB_POOL_SIZE=5, DB_MAX_OVERFLOW=10),
+    'wal_normal': dict(),
+    'wal_normal_pool_5_overflow_10': dict(DB_POOL_SIZE=5, DB_MAX_OVERFLOW=10),
+    'wal_normal_pool_2': dict(DB_POOL_SIZE=2, DB_MAX_OVERFLOW=0),
+    'wal_normal_pool_5': dict(DB_POOL_SIZE=5, DB_MAX_OVERFLOW=0),
+    'wal_normal_pool_20': dict(DB_POOL_SIZE=20, DB_MAX_OVERFLOW=0),
+}
+
+
+async def run_scenario(settings, args):
+    from sqlalchemy import desc, select
+    from models import Expense, ExpenseRollup, User
+    from utils.extensions import create_engine_from_config
+    from utils.migrations import upgrade
+    from utils.rollup import RollupDelta
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine_from_config(settings)
+    await upgrade(engine)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        session.add_all([User(id=i, username=f"u{i}", email=f"u{i}@x", password_hash=b"x", income="0", description="")
+                         for i in range(1, args.writers + 1)])
+        await session.commit()
+
+    errors = []
+    read_ms = []
+    done = asyncio.Event()
+
+    async def writer(user_id):
+        for i in range(args.writes):
+            t0 = time.perf_counter()
+            try:
+                async with Session() as session:
+                    ts = datetime(2024, i % 12 + 1, 1)
+                    session.add(Expense(title="t", amount=10, category="food", timestamp=ts, user_id=user_id))
+                    rollup = RollupDelta()
+                    rollup.add(user_id, ts, "food", 10)
+                    await rollup.flush(session)
+                    await session.commit()
+            except Exception as e:      # "database is locked" and friends
+                errors.append(f"after {time.perf_counter() - t0:.2f}s: {str(getattr(e, 'orig', e))[:200]}")
+
+    async def reader(user_id):
+        while not done.is_set():
+            started = time.perf_counter()
+            async with Session() as session:
+                await session.execute(
+                    select(ExpenseRollup.total).where(ExpenseRollup.user_id == user_id)
+                    .order_by(desc(ExpenseRollup.month)).limit(1)
+                )
+            read_ms.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0)
+
+    readers = [asyncio.create_task(reader(i % args.writers + 1)) for i in range(args.readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(i) for i in range(1, args.writers + 1)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*readers)
+    await engine.dispose()
+
+    return {
+        'writes_per_sec': round((args.writers * args.writes - len(errors)) / elapsed, 1),
+        'write_errors': len(errors),
+        'sample_error': errors[0] if errors else None,
+        'read_ms': percentiles(read_ms),
+    }
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument('--writers', type=int, default=16)
+    p.add_argument('--writes', type=int, default=50, help='transactions per writer')
+    p.add_argument('--readers', type=int, default=4)
+    args = p.parse_args()
+
+    use_scratch_database('engine')
+    from utils.config import Config
+    from utils.extensions import config_dict
+
+    results = {}
+    for name, overrides in SCENARIOS.items():
+        path = os.path.join(tempfile.mkdtemp(prefix='bench-'), f'{name}.db')
+        settings = {**config_dict(Config), 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, **overrides}
+        results[name] = asyncio.run(run_scenario(settings, args))
+
+    emit({'benchmark': 'engine', 'writers': args.writers, 'writes_each': args.writes,
+          'readers': args.readers, 'scenarios': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
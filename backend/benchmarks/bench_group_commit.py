@@ -0,0 +1,115 @@
+# benchmarks/bench_group_commit.py
+"""Concurrent POST /api/expense/create: one commit per request vs group commit.
+
+    pipenv run python -m benchmarks.bench_group_commit --clients 32 --requests 50
+
+Each mode runs in its own process (config is read when `app` is imported):
+uvicorn serves app:asgi_app from a background thread while client threads,
+one user each, create expenses. Commits are counted with an engine event in
+the server process, so commits_per_s and rows_per_commit show how much
+utils/group_commit.py coalesced. --synchronous FULL makes every commit an
+fsync, the case group commit is for.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import emit, free_port, http, http_login, parser, percentiles, quiet, use_scratch_database
+
+MODES = {'per-request': '0', 'group': '1'}
+
+
+def child(mode, args):
+    env = {'GROUP_COMMIT_ENABLED': MODES[mode], 'BCRYPT_ROUNDS': '4', 'RESPONSE_CACHE_BACKEND': 'none'}
+    if args.synchronous:
+        env['SQLITE_SYNCHRONOUS'] = args.synchronous
+    use_scratch_database(f'group-commit-{mode}', **env)
+    stdout = quiet()
+
+    import uvicorn
+    from sqlalchemy import event
+    import app as backend
+    from utils.extensions import engine
+
+    commits = [0]
+    event.listen(engine.sync_engine, 'commit', lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(backend.asgi_app, port=port, log_level='warning', access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started and thread.is_alive():
+        time.sleep(0.02)
+    base = f'http://127.0.0.1:{port}'
+
+    auths = [http_login(base, f'writer{i}') for i in range(args.clients)]
+    commits[0] = 0
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def client(auth):
+        mine, failed = [], 0
+        for i in range(args.requests):
+            started = time.perf_counter()
+            status, _ = http(base, 'POST', '/api/expense/create', {
+                'amount': 10 + i, 'categoryName': 'food', 'title': f'e{i}',
+                'date': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}',
+            }, auth)
+            mine.append((time.perf_counter() - started) * 1000)
+            failed += status != 200
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(auth,)) for auth in auths]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    server.should_exit = True
+    thread.join(10)
+    stdout.write(json.dumps({
+        'creates_per_s': round(len(latencies) / elapsed, 1),
+        'commits_per_s': round(commits[0] / elapsed, 1),
+        'rows_per_commit': round(len(latencies) / max(1, commits[0]), 2),
+        'latency_ms': percentiles(latencies),
+        'failed': sum(failures),
+    }) + '\n')
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--clients', type=int, default=32)
+    p.add_argument('--requests', type=int, default=50, help='per client')
+    p.add_argument('--synchronous', default=None, help='SQLITE_SYNCHRONOUS (FULL = fsync per commit)')
+    p.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        return child(args.child, args)
+
+    result = {'clients': args.clients, 'requests_per_client': args.requests,
+              'synchronous': args.synchronous or 'default'}
+    for mode in MODES:
+        command = [sys.executable, '-m', 'benchmarks.bench_group_commit', '--child', mode,
+                   '--clients', str(args.clients), '--requests', str(args.requests)]
+        if args.synchronous:
+            command += ['--synchronous', args.synchronous]
+        out = subprocess.run(
+            command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True, capture_output=True, text=True,
+        )
+        result[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    result['speedup'] = round(result['group']['creates_per_s'] / result['per-request']['creates_per_s'], 2)
+    emit(result, args.out)
+
+
+if __name__ == '__main__':
+    main()
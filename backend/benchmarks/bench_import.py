@@ -0,0 +1,59 @@
+# benchmarks/bench_import.py
+"""Rows/second of /api/expense/import against one /api/expense/create call per row."""
+import sys
+import time
+import tracemalloc
+from benchmarks.common import emit, login, parser, quiet, use_scratch_database
+
+
+def csv_body(rows):
+    lines = ["amount,categoryName,title,date\n"]
+    lines += [f"{i % 90 + 10},cat{i % 7},row {i},20{20 + i % 5}-{i % 12 + 1:02d}-{i % 28 + 1:02d}\n" for i in range(rows)]
+    return "".join(lines).encode()
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument('--rows', type=int, default=5000)
+    p.add_argument('--single-rows', type=int, default=1000, help='rows sent one by one (slow path)')
+    args = p.parse_args()
+
+    use_scratch_database('import')
+    stdout = quiet()
+    from app import app
+    client = app.test_client()
+
+    headers = login(client, 'one_by_one')
+    started = time.perf_counter()
+    for i in range(args.single_rows):
+        client.post('/api/expense/create', headers=headers, json=dict(
+            amount=i % 90 + 10, categoryName=f"cat{i % 7}", title=f"row {i}", date="2024-01-15",
+        ))
+    single_rps = args.single_rows / (time.perf_counter() - started)
+
+    headers = login(client, 'bulk')
+    body = csv_body(args.rows)
+    tracemalloc.start()
+    started = time.perf_counter()
+    res = client.post('/api/expense/import', data=body, headers={**headers, 'Content-Type': 'text/csv'})
+    bulk_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sys.stdout = stdout
+    emit({
+        'benchmark': 'import',
+        'one_by_one': {'rows': args.single_rows, 'rows_per_sec': round(single_rps, 1)},
+        'bulk': {
+            'rows': args.rows,
+            'imported': res.get_json()['imported'],
+            'rows_per_sec': round(args.rows / bulk_seconds, 1),
+            'peak_traced_kib': round(peak / 1024, 1),
+            'upload_kib': round(len(body) / 1024, 1),
+        },
+        'speedup': round(args.rows / bulk_seconds / single_rps, 1),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
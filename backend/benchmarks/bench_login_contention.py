@@ -0,0 +1,65 @@
+# benchmarks/bench_login_contention.py
+"""Dashboard latency (/latestMonthTotal) while a crowd of clients hammers /login.
+
+Runs the server under uvicorn twice: bcrypt inline in the request
+(BCRYPT_MAX_WORKERS=0, the old behaviour) and on the bounded hasher pool.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import emit, http, http_login, parser, percentiles, serve, use_scratch_database
+
+
+def measure(env, args):
+    with serve(env) as base:
+        dash_headers = http_login(base, 'dashboard')
+        http(base, 'POST', '/api/expense/create', dict(
+            amount=10, categoryName='food', title='x', date='2024-01-01'), dash_headers)
+        http_login(base, 'hammer')
+
+        stop = threading.Event()
+        statuses = []
+
+        def hammer():
+            while not stop.is_set():
+                status, _ = http(base, 'POST', '/api/auth/login',
+                                 dict(username='hammer', email='hammer@example.com', password='benchmark'))
+                statuses.append(status)
+
+        with ThreadPoolExecutor(args.login_clients) as pool:
+            for _ in range(args.login_clients):
+                pool.submit(hammer)
+            time.sleep(0.5)
+            samples = []
+            for _ in range(args.samples):
+                started = time.perf_counter()
+                http(base, 'GET', '/api/expense/latestMonthTotal', headers=dash_headers)
+                samples.append((time.perf_counter() - started) * 1000)
+            stop.set()
+
+    return {
+        'dashboard_ms': percentiles(samples),
+        'logins': {'ok': statuses.count(200), 'shed_503': statuses.count(503), 'total': len(statuses)},
+    }
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument('--login-clients', type=int, default=8)
+    p.add_argument('--samples', type=int, default=100)
+    p.add_argument('--rounds', type=int, default=12, help='BCRYPT_ROUNDS')
+    p.add_argument('--workers', type=int, default=2, help='BCRYPT_MAX_WORKERS for the pooled run')
+    args = p.parse_args()
+
+    use_scratch_database('login_contention', BCRYPT_ROUNDS=str(args.rounds))
+    emit({
+        'benchmark': 'login_contention',
+        'login_clients': args.login_clients,
+        'bcrypt_rounds': args.rounds,
+        'inline': measure({'BCRYPT_MAX_WORKERS': '0'}, args),
+        'pooled': measure({'BCRYPT_MAX_WORKERS': str(args.workers)}, args),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_read_path.py
+"""Time and memory per N rows: ORM entities + jsonify vs column tuples + fast JSON.
+
+    pipenv run python -m benchmarks.bench_read_path --rows 10000
+
+'orm' is what the read endpoints used to do (select(Expense), copy every
+entity into a dict with isoformat(), jsonify). 'projection' is the shared
+path they use now (select only the columns, rows_to_dicts, json_response).
+Memory is the tracemalloc peak while building one response.
+"""
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.common import emit, parser, quiet, use_scratch_database
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--rows', type=int, default=10000)
+    p.add_argument('--repeat', type=int, default=10)
+    args = p.parse_args()
+
+    use_scratch_database('read_path')
+    stdout = quiet()
+    from flask import jsonify
+    from sqlalchemy import desc, insert, select
+    from app import app     # building the app runs AUTO_MIGRATE on the scratch database
+    from controllers.expense_controller import EXPENSE_FIELDS, expense_columns
+    from models import Expense, User
+    from utils.extensions import async_session, engine
+    from utils.json_response import json_response, orjson, rows_to_dicts
+
+    async def seed():
+        async with async_session() as session:
+            session.add(User(id=1, username='reader', email='reader@example.com', password_hash=b'x'))
+            start = datetime(2024, 1, 1)
+            await session.execute(insert(Expense), [
+                {'title': f'expense {i}', 'amount': i % 500 + 0.5, 'category': ('food', 'rent', 'travel')[i % 3],
+                 'timestamp': start + timedelta(minutes=i), 'user_id': 1}
+                for i in range(args.rows)
+            ])
+            await session.commit()
+
+    async def orm_path():
+        async with async_session() as session:
+            result = await session.execute(
+                select(Expense).where(Expense.user_id == 1).order_by(desc(Expense.timestamp))
+            )
+            rows = result.scalars().all()
+            expenses = [
+                {"id": e.id, "title": e.title, "amount": e.amount,
+                 "category": e.category, "timestamp": e.timestamp.isoformat()}
+                for e in rows
+            ]
+        return jsonify(expenses=expenses).get_data()
+
+    async def projection_path():
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(*expense_columns()).where(Expense.user_id == 1).order_by(desc(Expense.timestamp))
+            )).all()
+        return json_response({"expenses": rows_to_dicts(rows, EXPENSE_FIELDS)}).get_data()
+
+    def measure(loop, path):
+        loop.run_until_complete(path())          # warm-up
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = loop.run_until_complete(path())
+            times.append((time.perf_counter() - started) * 1000)
+        tracemalloc.start()
+        loop.run_until_complete(path())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'ms_median': round(statistics.median(times), 2),
+            'ms_min': round(min(times), 2),
+            'peak_mib': round(peak / 2 ** 20, 2),
+            'body_bytes': len(body),
+        }
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(seed())
+    with app.app_context():
+        orm = measure(loop, orm_path)
+        projection = measure(loop, projection_path)
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+    sys.stdout = stdout
+    emit({
+        'benchmark': 'read_path',
+        'rows': args.rows,
+        'json_encoder': 'orjson' if orjson is not None else 'json',
+        'orm': orm,
+        'projection': projection,
+        'speedup': round(orm['ms_median'] / projection['ms_median'], 2),
+        'memory_ratio': round(orm['peak_mib'] / projection['peak_mib'], 2),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_search.py
+"""Search latency as the expense table grows: FTS index vs a LIKE scan.
+
+    pipenv run python -m benchmarks.bench_search --sizes 10000,100000,300000
+
+One searching user keeps the same --user-rows expenses while other users'
+rows are added around them. search_ms runs the endpoint's statements directly,
+endpoint_ms goes through /api/expense/search; both should stay flat. The LIKE
+queries give the same answer without the index by testing every one of the
+user's rows, so they grow with the user's history instead (try --user-rows).
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from benchmarks.common import emit, login, parser, quiet, use_scratch_database
+from benchmarks.seed import seed
+
+QUERIES = ('uber', 'foo', 'rent', 'tra')
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--sizes', default='10000,100000,300000', help='total expense rows')
+    p.add_argument('--repeat', type=int, default=20)
+    p.add_argument('--user-rows', type=int, default=1000)
+    args = p.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    use_scratch_database('search', BCRYPT_ROUNDS='4', RESPONSE_CACHE_BACKEND='none')
+    stdout = quiet()
+    from sqlalchemy import desc, func, insert, or_, select
+    from app import app
+    from models import Expense
+    from utils.extensions import async_session
+    from utils.search import apply_search, search_terms
+
+    client = app.test_client()
+    headers = login(client, 'searcher')
+    user_id = client.get('/api/auth/checkAuth', headers=headers).get_json()['userData'][0]['id']
+
+    async def own_rows():
+        async with async_session() as session:
+            titles = ['Uber ride', 'Foodpanda order', 'rent', 'train ticket', 'groceries']
+            await session.execute(insert(Expense), [
+                {'title': titles[i % len(titles)] + f' {i}', 'amount': 10 + i % 90, 'category': 'misc',
+                 'user_id': user_id} for i in range(args.user_rows)
+            ])
+            await session.commit()
+
+    async def search(q):
+        # the two statements /api/expense/search runs for a first page
+        async with async_session() as session:
+            terms = search_terms(q)
+            stmt, title_hit = apply_search(select(Expense.id).where(Expense.user_id == user_id), 'sqlite', user_id, terms)
+            await session.execute(stmt.order_by(desc(title_hit), desc(Expense.timestamp), desc(Expense.id)).limit(21))
+            summary, _ = apply_search(select(func.sum(Expense.amount), func.count()).where(Expense.user_id == user_id),
+                                      'sqlite', user_id, terms)
+            await session.execute(summary)
+
+    async def like(q):
+        # same answer without the index: every one of the user's rows is tested
+        async with async_session() as session:
+            match = (Expense.user_id == user_id,
+                     or_(Expense.title.ilike(f'%{q}%'), Expense.category.ilike(f'%{q}%')))
+            await session.execute(select(Expense.id).where(*match).order_by(desc(Expense.timestamp)).limit(21))
+            await session.execute(select(func.sum(Expense.amount), func.count()).where(*match))
+
+    def timed(call):
+        samples = []
+        for _ in range(args.repeat):
+            for q in QUERIES:
+                started = time.perf_counter()
+                call(q)
+                samples.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(samples), 3)
+
+    asyncio.run(own_rows())
+    results, rows = [], args.user_rows
+    for size in sizes:
+        if size > rows:
+            # other users; 200 expenses each
+            asyncio.run(seed(async_session, (size - rows) // 200, 200, seed=size, rounds=4))
+            rows = size
+        results.append({
+            'rows': rows,
+            'search_ms': timed(lambda q: asyncio.run(search(q))),
+            'like_scan_ms': timed(lambda q: asyncio.run(like(q))),
+            'endpoint_ms': timed(lambda q: client.get(f'/api/expense/search?q={q}', headers=headers)),
+        })
+
+    sys.stdout = stdout
+    emit({'benchmark': 'search', 'user_rows': args.user_rows, 'results': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
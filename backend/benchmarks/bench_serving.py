@@ -0,0 +1,117 @@
+# benchmarks/bench_serving.py
+"""Requests/s and connection-pool reuse: PersistentLoopASGI vs plain WsgiToAsgi.
+
+    pipenv run python -m benchmarks.bench_serving --clients 16 --requests 100
+
+Each mode runs in its own process (the mode is picked when `app` is imported):
+uvicorn serves app:asgi_app from a background thread while client threads hit
+the read endpoints. Pool reuse is checkouts per new DBAPI connection, counted
+with engine events inside the server process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import (
+    emit, free_port, http, http_login, parser, percentiles, quiet, use_scratch_database,
+)
+
+MODES = {'per-request': '0', 'persistent': '1'}
+PATHS = ('/api/expense/recent', '/api/expense/latestMonthTotal', '/api/expense/recentmonthsExpense')
+
+
+def child(mode, clients, requests):
+    # no response cache: the reads must reach the pool and the event loop being measured
+    use_scratch_database(f'serving-{mode}', PERSISTENT_EVENT_LOOP=MODES[mode], RESPONSE_CACHE_BACKEND='none')
+    stdout = quiet()
+
+    import uvicorn
+    from sqlalchemy import event
+    import app as backend
+    from utils.extensions import engine
+
+    counts = {'connect': 0, 'checkout': 0}
+    event.listen(engine.sync_engine, 'connect', lambda *a: counts.__setitem__('connect', counts['connect'] + 1))
+    event.listen(engine.sync_engine, 'checkout', lambda *a: counts.__setitem__('checkout', counts['checkout'] + 1))
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        backend.asgi_app, port=port, log_level='warning', access_log=False,
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started and thread.is_alive():
+        time.sleep(0.02)
+    base = f'http://127.0.0.1:{port}'
+
+    auth = http_login(base, 'serving')
+    for day in range(60):
+        http(base, 'POST', '/api/expense/create', {
+            'amount': 10 + day, 'categoryName': 'food', 'title': f'e{day}',
+            'date': f'2024-{1 + day // 28:02d}-{1 + day % 28:02d}',
+        }, auth)
+
+    counts.update(connect=0, checkout=0)
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        mine = []
+        for i in range(requests):
+            started = time.perf_counter()
+            status, _ = http(base, 'GET', PATHS[i % len(PATHS)], headers=auth)
+            mine.append((time.perf_counter() - started) * 1000)
+            assert status == 200, status
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    server.should_exit = True
+    thread.join(10)
+    stdout.write(json.dumps({
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'latency_ms': percentiles(latencies),
+        'db_connects': counts['connect'],
+        'db_checkouts': counts['checkout'],
+        'checkouts_per_connect': round(counts['checkout'] / max(1, counts['connect']), 1),
+    }) + '\n')
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--clients', type=int, default=16)
+    p.add_argument('--requests', type=int, default=100, help='per client')
+    p.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        return child(args.child, args.clients, args.requests)
+
+    result = {'clients': args.clients, 'requests_per_client': args.requests}
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_serving', '--child', mode,
+             '--clients', str(args.clients), '--requests', str(args.requests)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            check=True, capture_output=True, text=True,
+        )
+        result[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    result['speedup'] = round(
+        result['persistent']['requests_per_s'] / result['per-request']['requests_per_s'], 2
+    )
+    emit(result, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/bench_shards.py
+"""Write throughput as expense storage is split over more SQLite files.
+
+    pipenv run python -m benchmarks.bench_shards --shards 1,2,4 --writers 32 --processes 4
+
+For each shard count a fresh set of files is made and routed through
+utils.extensions.ShardRouter, then `--writers` users (one task each, spread
+over `--processes` worker processes, like uvicorn --workers) run
+create_expense's transaction `--writes` times: insert the expense, flush the
+rollup / balance deltas, read the savings back and commit, all on the user's
+shard. With one file every commit in every process waits for the same writer
+lock; each extra shard is a lock (and a WAL to fsync) of its own. Throughput
+only scales while there are CPUs for the extra processes - with one CPU the
+run is bound by Python, and more shards mostly show up as lower latency.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from benchmarks.common import emit, parser, percentiles, use_scratch_database
+
+
+def make_router(settings):
+    from utils.extensions import LazyEngine, ShardRouter
+    main = LazyEngine()
+    main.configure(settings)
+    router = ShardRouter(main)
+    router.configure(settings)
+    return router
+
+
+async def prepare(settings, writers):
+    """Schema on every shard, the users on shard 0 and their copies where they live."""
+    from models import User
+    from utils.migrations import upgrade
+    from utils.shards import upsert_user_copies
+
+    router = make_router(settings)
+    for database in router.databases():
+        await upgrade(database)
+
+    users = [User(id=i, username=f"u{i}", email=f"u{i}@x", password_hash=b"x", income="0", description="")
+             for i in range(1, writers + 1)]
+    async with router.session(0) as session:
+        session.add_all(users)
+        await session.commit()
+    for index in range(1, router.count):
+        async with router.session(index) as session:
+            await upsert_user_copies(session, [u for u in users if router.shard_of(u.id) == index])
+            await session.commit()
+    for database in router.databases():
+        await database.dispose()
+
+    per_shard = [0] * router.count
+    for user in users:
+        per_shard[router.shard_of(user.id)] += 1
+    return per_shard
+
+
+async def write(settings, user_ids, writes):
+    from models import Expense
+    from utils.balance import load_savings
+    from utils.rollup import RollupDelta
+
+    router = make_router(settings)
+    errors, write_ms = [], []
+
+    async def writer(user_id):
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                async with router.session(router.shard_of(user_id)) as session:
+                    ts = datetime(2024, i % 12 + 1, 1)
+                    session.add(Expense(title="t", amount=10, category="food", timestamp=ts, user_id=user_id))
+                    rollup = RollupDelta()
+                    rollup.add(user_id, ts, "food", 10)
+                    await rollup.flush(session)
+                    await load_savings(session, user_id)
+                    await session.commit()
+                write_ms.append((time.perf_counter() - started) * 1000)
+            except Exception as e:      # "database is locked" and friends
+                errors.append(str(getattr(e, 'orig', e))[:200])
+
+    await asyncio.gather(*(writer(user_id) for user_id in user_ids))
+    for database in router.databases():
+        await database.dispose()
+    return write_ms, errors
+
+
+def warm_up(_):
+    import utils.balance, utils.rollup, utils.extensions  # noqa: F401
+
+
+def write_process(settings, user_ids, writes):
+    return asyncio.run(write(settings, user_ids, writes))
+
+
+def run_scenario(settings, args):
+    per_shard = asyncio.run(prepare(settings, args.writers))
+    groups = [list(range(p + 1, args.writers + 1, args.processes)) for p in range(args.processes)]
+
+    with ProcessPoolExecutor(args.processes) as pool:
+        list(pool.map(warm_up, range(args.processes)))     # processes up and imports done before the clock starts
+        started = time.perf_counter()
+        results = list(pool.map(write_process, [settings] * len(groups), groups, [args.writes] * len(groups)))
+        elapsed = time.perf_counter() - started
+
+    write_ms = [ms for samples, _ in results for ms in samples]
+    errors = [e for _, failed in results for e in failed]
+    return {
+        'writes_per_sec': round(len(write_ms) / elapsed, 1),
+        'write_ms': percentiles(write_ms),
+        'write_errors': len(errors),
+        'sample_error': errors[0] if errors else None,
+        'users_per_shard': per_shard,
+    }
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--shards', default='1,2,4', help='shard counts to compare')
+    p.add_argument('--writers', type=int, default=32)
+    p.add_argument('--writes', type=int, default=50, help='transactions per writer')
+    p.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    p.add_argument('--synchronous', default=None, help='SQLITE_SYNCHRONOUS for every shard (FULL = fsync per commit)')
+    args = p.parse_args()
+
+    use_scratch_database('shards')
+    from utils.config import Config
+    from utils.extensions import config_dict
+
+    results = {}
+    for count in [int(n) for n in args.shards.split(',')]:
+        directory = tempfile.mkdtemp(prefix='bench-')
+        urls = ['sqlite:///' + os.path.join(directory, f'shard{i}.db') for i in range(count)]
+        settings = {**config_dict(Config), 'SQLALCHEMY_DATABASE_URI': urls[0], 'SHARD_URLS': ','.join(urls)}
+        if args.synchronous:
+            settings['SQLITE_SYNCHRONOUS'] = args.synchronous
+        results[count] = run_scenario(settings, args)
+
+    emit({'benchmark': 'shards', 'writers': args.writers, 'writes_each': args.writes,
+          'processes': args.processes, 'cpus': os.cpu_count(),
+          'synchronous': args.synchronous or 'default', 'results': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_startup.py
+"""Worker cold start: import time, app build time and time to the first served request.
+
+    pipenv run python -m benchmarks.bench_startup --runs 5
+
+Every number comes from a fresh interpreter, the way a restarted or newly
+scaled-out worker sees it. The scratch database is migrated once up front
+(`flask db upgrade`) and AUTO_MIGRATE is off, so the runs measure a restart
+against a current schema.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import emit, free_port, parser, use_scratch_database
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.asgi_app
+built = time.perf_counter()
+print(json.dumps({'import_s': imported - started, 'import_to_asgi_app_s': built - started}))
+"""
+
+
+def probe_import():
+    out = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=BACKEND, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def wait_for(url, deadline, method='GET'):
+    while time.perf_counter() < deadline:
+        try:
+            req = urllib.request.Request(url, data=b'{}' if method == 'POST' else None, method=method,
+                                         headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(req, timeout=1)
+            return time.perf_counter()
+        except urllib.error.HTTPError:
+            return time.perf_counter()      # any HTTP answer means it was served
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def probe_first_request():
+    """Spawn uvicorn; seconds until /hola answers, then until a DB-backed request answers."""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:asgi_app', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f'http://127.0.0.1:{port}'
+        first = wait_for(base + '/hola', started + 60)
+        # a login with unknown credentials still runs the user lookup
+        first_db = wait_for(base + '/api/auth/login', started + 60, method='POST')
+        return {'first_request_s': first - started, 'first_db_request_s': first_db - started}
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def summarize(samples):
+    keys = samples[0].keys()
+    return {k: {'median': round(statistics.median(s[k] for s in samples), 4),
+                'min': round(min(s[k] for s in samples), 4)} for k in keys}
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--runs', type=int, default=5)
+    args = p.parse_args()
+
+    use_scratch_database('startup', AUTO_MIGRATE='0')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                   cwd=BACKEND, check=True, capture_output=True)
+
+    imports = [probe_import() for _ in range(args.runs)]
+    requests = [probe_first_request() for _ in range(args.runs)]
+    emit({
+        'benchmark': 'startup',
+        'runs': args.runs,
+        **summarize(imports),
+        **summarize(requests),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
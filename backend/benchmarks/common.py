@@ -0,0 +1,156 @@
+# benchmarks/common.py
+"""Shared helpers for the scripts in benchmarks/. Run them from backend/, e.g.
+
+    pipenv run python -m benchmarks.bench_import --rows 20000
+
+Every benchmark works on a scratch SQLite database and prints one JSON object,
+so runs can be diffed or collected by CI.
+"""
+import argparse
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+
+def use_scratch_database(name, **env):
+    """Point the app at a throwaway database. Must run before `app` is imported."""
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), f'{name}.db')
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + path,
+        'SAVINGS_THRESHOLD': '-1e12',       # never queue alert mail while benchmarking
+        'ALERT_DISPATCHER_ENABLED': '0',
+        'AUTO_MIGRATE': '1',                # a fresh file needs the schema
+        'RATE_LIMIT_ENABLED': '0',          # every client comes from 127.0.0.1
+        **env,
+    })
+    return path
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument('--out', help='also write the JSON result to this file')
+    return p
+
+
+def login(client, username, password='benchmark'):
+    """Register (if needed) and log in; returns the Authorization header dict."""
+    creds = dict(username=username, email=f'{username}@example.com', password=password)
+    client.post('/api/auth/register', json=creds)
+    token = client.post('/api/auth/login', json=creds).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def percentiles(samples_ms):
+    """p50 / p95 / p99 / max of a list of latencies in milliseconds."""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {'n': len(ordered), 'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(ordered[-1], 3)}
+
+
+def emit(result, out=None):
+    text = json.dumps(result, indent=2, sort_keys=True)
+    print(text)
+    if out:
+        with open(out, 'w') as f:
+            f.write(text + '\n')
+
+
+def quiet():
+    """The controllers still print() on the hot path; keep that out of the JSON on stdout."""
+    sys.stdout = open(os.devnull, 'w')
+    return sys.__stdout__
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(env=None, workers=1, app='app:asgi_app'):
+    """Run the backend under uvicorn on a free localhost port; yields the base URL."""
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(200):
+            try:
+                urllib.request.urlopen(base + '/hola', timeout=1)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def http(base, method, path, body=None, headers=None):
+    """Tiny JSON client for serve(); returns (status, parsed body or None)."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        base + path, data=data, method=method,
+        headers={'Content-Type': 'application/json', **(headers or {})},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=60) as res:
+            status, raw = res.status, res.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    try:
+        return status, json.loads(raw)
+    except ValueError:
+        return status, None
+
+
+def http_login(base, username, password='benchmark'):
+    creds = dict(username=username, email=f'{username}@example.com', password=password)
+    http(base, 'POST', '/api/auth/register', creds)
+    _, body = http(base, 'POST', '/api/auth/login', creds)
+    return {'Authorization': f"Bearer {body['access_token']}"}
+
+
+async def asgi_request(asgi_app, method, path, body=None, headers=None):
+    """Call an ASGI app in-process the way uvicorn would; returns (status, raw body)."""
+    path, _, query = path.partition('?')
+    data = json.dumps(body).encode() if body is not None else b''
+    headers = {'content-type': 'application/json', **(headers or {})}
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+                   + [(b'content-length', str(len(data)).encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80),
+    }
+    messages = [{'type': 'http.request', 'body': data, 'more_body': False}]
+    status, chunks = None, []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await asgi_app(scope, receive, send)
+    return status, b''.join(chunks)
@@ -0,0 +1,172 @@
+# benchmarks/loadtest.py
+"""Mixed-workload load test: throughput and p50/p95/p99 per endpoint.
+
+    pipenv run python -m benchmarks.loadtest --users 50 --expenses 500 --concurrency 16 --duration 20
+    pipenv run python -m benchmarks.loadtest --uvicorn --workers 2     # same, over localhost HTTP
+
+Seeds a scratch database (benchmarks/seed.py), then `--concurrency` virtual
+users each log in as a random seeded user and loop over the workload mix
+until `--duration` seconds are up. By default app.asgi_app is driven
+in-process, which leaves the network out of the numbers; --uvicorn serves it
+on localhost instead. Compare two runs by diffing their --out files.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.common import (
+    asgi_request, emit, http, parser, percentiles, quiet, serve, use_scratch_database,
+)
+from benchmarks.seed import PASSWORD, fake_expense, seed
+
+# name -> (weight, method, path)
+WORKLOAD = {
+    'login':            (1, 'POST', '/api/auth/login'),
+    'create':           (3, 'POST', '/api/expense/create'),
+    'read':             (4, 'GET',  '/api/expense/read?limit=50'),
+    'recent':           (6, 'GET',  '/api/expense/recent'),
+    'latestMonthTotal': (6, 'GET',  '/api/expense/latestMonthTotal'),
+}
+
+
+def parse_mix(text):
+    """'login=1,recent=5' -> weights; unknown names are an error."""
+    weights = {name: spec[0] for name, spec in WORKLOAD.items()}
+    if text:
+        weights = dict.fromkeys(WORKLOAD, 0)
+        for part in text.split(','):
+            name, _, weight = part.partition('=')
+            if name not in WORKLOAD:
+                raise SystemExit(f"unknown endpoint {name!r}; pick from {', '.join(WORKLOAD)}")
+            weights[name] = float(weight or 1)
+    return weights
+
+
+async def run_load(call, usernames, args):
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    names = [n for n in WORKLOAD if weights[n]]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    now = datetime.utcnow()
+
+    async def request(name, body=None, headers=None):
+        _, method, path = WORKLOAD[name]
+        started = time.perf_counter()
+        status, payload = await call(method, path, body, headers)
+        latencies[name].append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            errors[name] += 1
+        return payload
+
+    async def virtual_user(deadline):
+        user_rng = random.Random(rng.random())
+        username = user_rng.choice(usernames)
+        creds = {'username': username, 'email': f'{username}@example.com', 'password': PASSWORD}
+        token = (await request('login', creds))['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        while time.perf_counter() < deadline:
+            name = user_rng.choices(names, weights=[weights[n] for n in names])[0]
+            if name == 'login':
+                await request('login', creds)
+            elif name == 'create':
+                row = fake_expense(user_rng, 0, now, 30)
+                await request('create', {
+                    'title': row['title'], 'amount': max(1, int(row['amount'])),
+                    'categoryName': row['category'], 'date': row['timestamp'].strftime('%Y-%m-%d'),
+                }, headers)
+            else:
+                await request(name, headers=headers)
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(virtual_user(deadline) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        'seconds': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1),
+        'errors': sum(errors.values()),
+        'endpoints': {
+            name: {
+                **percentiles(latencies[name]),
+                'rps': round(len(latencies[name]) / elapsed, 1),
+                'errors': errors[name],
+            }
+            for name in names
+        },
+    }
+
+
+def main():
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--users', type=int, default=50)
+    p.add_argument('--expenses', type=int, default=500, help='seeded per user')
+    p.add_argument('--concurrency', type=int, default=16)
+    p.add_argument('--duration', type=float, default=15, help='seconds')
+    p.add_argument('--mix', help="weights, e.g. 'login=1,create=3,read=4,recent=6,latestMonthTotal=6'")
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--bcrypt-rounds', type=int, default=4,
+                   help='cost of the seeded hashes (12 makes login dominate; see bench_login_contention)')
+    p.add_argument('--uvicorn', action='store_true', help='serve over localhost instead of in-process')
+    p.add_argument('--workers', type=int, default=1, help='uvicorn workers (with --uvicorn)')
+    args = p.parse_args()
+
+    use_scratch_database('loadtest', BCRYPT_ROUNDS=str(args.bcrypt_rounds))
+    stdout = quiet()
+    from app import app, asgi_app      # building the app runs AUTO_MIGRATE on the scratch database
+    from utils.extensions import async_session, engine
+
+    async def prepare():
+        usernames = await seed(async_session, args.users, args.expenses, seed=args.seed, rounds=args.bcrypt_rounds)
+        await engine.dispose()
+        return usernames
+
+    usernames = asyncio.run(prepare())
+    config = {
+        'mode': 'uvicorn' if args.uvicorn else 'in-process',
+        'users': args.users, 'expenses_per_user': args.expenses,
+        'concurrency': args.concurrency, 'mix': parse_mix(args.mix),
+        'persistent_event_loop': app.config['PERSISTENT_EVENT_LOOP'],
+        'response_cache': app.config['RESPONSE_CACHE_BACKEND'],
+        'workers': args.workers if args.uvicorn else 1,
+    }
+
+    if args.uvicorn:
+        with serve(workers=args.workers) as base:
+            pool = ThreadPoolExecutor(args.concurrency)     # one blocking HTTP client per virtual user
+
+            async def call(method, path, body, headers):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, http, base, method, path, body, headers)
+            result = asyncio.run(run_load(call, usernames, args))
+            pool.shutdown()
+    else:
+        async def call(method, path, body, headers):
+            status, raw = await asgi_request(asgi_app, method, path, body, headers)
+            try:
+                return status, json.loads(raw)
+            except ValueError:
+                return status, None
+
+        async def in_process():
+            try:
+                return await run_load(call, usernames, args)
+            finally:
+                await engine.dispose()
+        result = asyncio.run(in_process())
+
+    sys.stdout = stdout
+    emit({'benchmark': 'loadtest', 'config': config, **result}, args.out)
+
+
+if __name__ == '__main__':
+    main()
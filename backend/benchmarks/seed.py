@@ -0,0 +1,132 @@
+# benchmarks/seed.py
+"""Fill a database with synthetic users and expenses.
+
+    pipenv run python -m benchmarks.seed --users 200 --expenses 500 --database /tmp/seed.db
+
+Categories follow a rough household budget: many small food and transport
+expenses, one big rent payment a month, occasional travel. Amounts are
+log-normal per category; timestamps spread over the last --days days with
+more spending on weekends and in the evening. Every user's password is
+'benchmark' (user names are seed<user id>). The same --seed always
+produces the same data.
+"""
+import asyncio
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# category -> (relative frequency, median amount, spread)
+CATEGORIES = {
+    'food':          (40, 250, 0.6),
+    'transport':     (20, 120, 0.5),
+    'shopping':      (12, 900, 0.9),
+    'entertainment': (10, 500, 0.7),
+    'utilities':     (6, 1500, 0.3),
+    'health':        (5, 700, 0.8),
+    'travel':        (3, 6000, 0.7),
+    'rent':          (4, 15000, 0.1),
+}
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 4, 6, 5, 4, 5, 8, 7, 5, 5, 6, 8, 10, 12, 10, 7, 4, 2]
+WEEKDAY_WEIGHTS = [10, 10, 10, 11, 13, 17, 15]     # Monday .. Sunday
+PASSWORD = 'benchmark'
+
+
+def fake_expense(rng, user_id, now, days):
+    names = list(CATEGORIES)
+    category = rng.choices(names, weights=[CATEGORIES[c][0] for c in names])[0]
+    _, median, spread = CATEGORIES[category]
+    amount = round(rng.lognormvariate(math.log(median), spread), 2)
+
+    # pick a day, then keep it with a probability following the weekday weights
+    while True:
+        day = now - timedelta(days=rng.randrange(days))
+        if rng.random() * max(WEEKDAY_WEIGHTS) < WEEKDAY_WEIGHTS[day.weekday()]:
+            break
+    hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+    timestamp = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+
+    return {
+        'title': f'{category} #{rng.randrange(10000)}',
+        'amount': amount,
+        'category': category,
+        'timestamp': timestamp,
+        'user_id': user_id,
+    }
+
+
+async def seed(session_factory, users, expenses_per_user, days=365, seed=42, rounds=12, batch_size=5000):
+    """Insert `users` users with `expenses_per_user` expenses each, then rebuild the rollups."""
+    import bcrypt
+    from sqlalchemy import func, insert, select
+    from models import Expense, User
+    from utils.balance import rebuild_balances
+    from utils.rollup import rebuild_rollups
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds))  # shared, hashed once
+
+    async with session_factory() as session:
+        first = (await session.execute(select(func.coalesce(func.max(User.id), 0)))).scalar_one() + 1
+        await session.execute(insert(User), [
+            {'id': user_id, 'username': f'seed{user_id}', 'email': f'seed{user_id}@example.com',
+             'password_hash': password_hash, 'income': str(rng.randrange(30, 200) * 1000), 'description': ''}
+            for user_id in range(first, first + users)
+        ])
+
+        batch = []
+        for user_id in range(first, first + users):
+            for _ in range(expenses_per_user):
+                batch.append(fake_expense(rng, user_id, now, days))
+                if len(batch) >= batch_size:
+                    await session.execute(insert(Expense), batch)
+                    batch = []
+        if batch:
+            await session.execute(insert(Expense), batch)
+
+        await rebuild_rollups(session)
+        await rebuild_balances(session)
+        await session.commit()
+
+    return [f'seed{user_id}' for user_id in range(first, first + users)]
+
+
+def main():
+    from benchmarks.common import emit, parser, use_scratch_database
+
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--users', type=int, default=100)
+    p.add_argument('--expenses', type=int, default=200, help='per user')
+    p.add_argument('--days', type=int, default=365)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--database', help='SQLite file to fill (default: a scratch file)')
+    args = p.parse_args()
+
+    path = use_scratch_database('seed')
+    if args.database:
+        path = args.database
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(path)
+
+    import app
+    from utils.extensions import async_session, engine
+
+    async def run():
+        started = time.perf_counter()
+        await seed(async_session, args.users, args.expenses, args.days, args.seed, app.app.config['BCRYPT_ROUNDS'])
+        await engine.dispose()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    emit({
+        'benchmark': 'seed',
+        'database': path,
+        'users': args.users,
+        'expenses': args.users * args.expenses,
+        'seconds': round(elapsed, 2),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# checks/alert_delivery.py
+"""
+End-to-end check of the alert outbox against a local aiosmtpd server.
+
+Verifies that alerts are queued in the expense transaction, deduplicated per
+window, delivered in one batch over a single SMTP connection, and retried with
+backoff when the server is unreachable.
+
+    cd backend && pipenv run python -m checks.alert_delivery
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+PORT = free_port()
+os.environ.update(
+    DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'alerts.db'),
+    SAVINGS_THRESHOLD='1e12',          # every expense crosses it
+    SMTP_HOST='127.0.0.1',
+    SMTP_PORT=str(PORT),
+    SMTP_STARTTLS='0',
+    SMTP_USER='alerts@example.com',
+    SMTP_PASS='',
+    ALERT_DISPATCHER_ENABLED='0',      # drained explicitly below
+    AUTO_MIGRATE='1',
+)
+
+from aiosmtpd.controller import Controller  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def add_user_with_expenses(client, name, count):
+    creds = dict(username=name, email=f"{name}@example.com", password="secret")
+    client.post("/api/auth/register", json=creds)
+    token = client.post("/api/auth/login", json=creds).get_json()["access_token"]
+    for day in range(1, count + 1):
+        client.post("/api/expense/create", headers={"Authorization": f"Bearer {token}"}, json=dict(
+            amount=10, categoryName="food", title="lunch", date=f"2024-05-{day:02d}",
+        ))
+
+
+def main():
+    from app import app
+    from models import AlertOutbox
+    from utils.alert_dispatcher import AlertDispatcher
+    from utils.extensions import async_session
+
+    async def outbox():
+        async with async_session() as session:
+            return (await session.execute(select(AlertOutbox).order_by(AlertOutbox.id))).scalars().all()
+
+    client = app.test_client()
+    inbox = Inbox()
+    smtpd = Controller(inbox, hostname="127.0.0.1", port=PORT)
+    smtpd.start()
+
+    failures = []
+    def expect(cond, what):
+        print("ok  " if cond else "FAIL", what)
+        if not cond:
+            failures.append(what)
+
+    add_user_with_expenses(client, "alice", 3)
+    add_user_with_expenses(client, "bob", 2)
+    rows = asyncio.run(outbox())
+    expect(len(rows) == 2, f"one queued alert per user inside the dedup window (got {len(rows)})")
+
+    dispatcher = AlertDispatcher(app.config)
+    processed = asyncio.run(dispatcher.drain_once())
+    expect(processed == 2 and len(inbox.messages) == 2, "batch delivered")
+    expect(inbox.connections == 1, f"batch shared one SMTP connection (got {inbox.connections})")
+    expect(all(r.status == 'sent' for r in asyncio.run(outbox())), "rows marked sent")
+    expect(asyncio.run(dispatcher.drain_once()) == 0, "nothing is sent twice")
+    dispatcher.close()
+
+    smtpd.stop()
+    add_user_with_expenses(client, "carol", 1)
+    asyncio.run(dispatcher.drain_once())
+    carol = asyncio.run(outbox())[-1]
+    expect(carol.status == 'pending' and carol.attempts == 1 and carol.next_attempt_at > carol.created_at,
+           "unreachable server -> retried later with backoff")
+
+    print(f"\n{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# checks/login_queries.py
+"""
+Asserts that login and the profile endpoints cost a fixed number of queries.
+
+Logs the same user in with an empty history and again after inserting
+--expenses rows, counting the SQL statements each request sends. Any growth
+means something started loading User.expenses again.
+
+    cd backend && python -m checks.login_queries
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'login_queries.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ['ALERT_DISPATCHER_ENABLED'] = '0'
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+from sqlalchemy import event, insert  # noqa: E402
+
+# statements per request; login is one SELECT of (id, password_hash)
+EXPECTED = {'login': 1, 'checkAuth': 1, 'updateProfile': 1}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument('--expenses', type=int, default=5000)
+    args = p.parse_args()
+
+    from app import app
+    from models import Expense
+    from commands import run_async
+    from utils.extensions import async_session, engine
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    creds = dict(username="counter", email="counter@example.com", password="secret")
+    client.post("/api/auth/register", json=creds)
+
+    def count(name):
+        del statements[:]
+        if name == 'login':
+            res = client.post("/api/auth/login", json=creds)
+            client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {res.get_json()['access_token']}"
+        elif name == 'checkAuth':
+            res = client.get("/api/auth/checkAuth")
+        else:
+            res = client.post("/api/auth/updateProfile", json=dict(description=f"{len(statements)}"))
+        assert res.status_code == 200, (name, res.status_code, res.get_json())
+        return len(statements)
+
+    before = {name: count(name) for name in EXPECTED}
+
+    async def add_history():
+        async with async_session() as session:
+            start = datetime(2020, 1, 1)
+            await session.execute(insert(Expense), [
+                dict(title=f"e{i}", amount=1, category="food", timestamp=start + timedelta(hours=i), user_id=1)
+                for i in range(args.expenses)
+            ])
+            await session.commit()
+    run_async(add_history())
+
+    after = {name: count(name) for name in EXPECTED}
+
+    failures = 0
+    for name, expected in EXPECTED.items():
+        ok = before[name] == after[name] == expected
+        failures += not ok
+        print("ok  " if ok else "FAIL", f"{name}: {before[name]} queries with no expenses, "
+              f"{after[name]} with {args.expenses} (expected {expected})")
+    print(f"\n{failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
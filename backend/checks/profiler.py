@@ -0,0 +1,61 @@
+# checks/profiler.py
+"""
+Asserts that the request profiler only answers to its token and never breaks a request.
+
+Sends the right token, a wrong one, a non-ASCII one and none, and checks
+that every request still gets its normal response and that only the first
+one writes a profile.
+
+    cd backend && python -m checks.profiler
+"""
+import os
+import sys
+import tempfile
+
+TMP = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP, 'profiler.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ['ALERT_DISPATCHER_ENABLED'] = '0'
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+os.environ['PROFILE_ENABLED'] = '1'
+os.environ['PROFILE_TOKEN'] = 'profile-check-token'
+os.environ['PROFILE_SAMPLE_RATE'] = '0'
+os.environ['PROFILE_DIR'] = os.path.join(TMP, 'profiles')
+
+# X-Profile value -> whether a profile should be written
+CASES = {
+    'token': ('profile-check-token', True),
+    'wrong token': ('not-the-token', False),
+    'non-ASCII': ('pröfile-éé', False),
+    'no header': (None, False),
+}
+
+
+def main():
+    from app import app
+
+    client = app.test_client()
+    creds = dict(username="profiled", email="profiled@example.com", password="secret")
+    client.post("/api/auth/register", json=creds)
+    token = client.post("/api/auth/login", json=creds).get_json()["access_token"]
+
+    failures = 0
+    for name, (value, wanted) in CASES.items():
+        headers = {"Authorization": f"Bearer {token}"}
+        if value is not None:
+            headers["X-Profile"] = value
+        before = set(os.listdir(os.environ['PROFILE_DIR']))
+        res = client.get("/api/auth/checkAuth", headers=headers)
+        written = set(os.listdir(os.environ['PROFILE_DIR'])) - before
+
+        ok = res.status_code == 200 and bool(written) == wanted \
+            and ('X-Profile-File' in res.headers) == wanted
+        failures += not ok
+        print("ok  " if ok else "FAIL", f"{name}: status {res.status_code}, "
+              f"{len(written)} profile(s) written (expected {int(wanted)})")
+    print(f"\n{failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
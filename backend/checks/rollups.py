@@ -0,0 +1,97 @@
+# checks/rollups.py
+"""
+Asserts that expense_rollup matches the expense table after every kind of write.
+
+Creates, edits, batch-updates and deletes expenses (including blank
+categories, which must be refused: '' is the month-total key) and after
+each write compares every rollup row with the totals of the expenses.
+
+    cd backend && python -m checks.rollups
+"""
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'rollups.db')
+os.environ['AUTO_MIGRATE'] = '1'
+os.environ['ALERT_DISPATCHER_ENABLED'] = '0'
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ['SAVINGS_THRESHOLD'] = '-1e12'
+
+from sqlalchemy import select  # noqa: E402
+
+
+def main():
+    from app import app
+    from commands import run_async
+    from models import Expense, ExpenseRollup
+    from utils.extensions import async_session
+    from utils.rollup import ALL_CATEGORIES, RollupDelta, month_key
+
+    client = app.test_client()
+    creds = dict(username="rolled", email="rolled@example.com", password="secret")
+    client.post("/api/auth/register", json=creds)
+    client.environ_base['HTTP_AUTHORIZATION'] = \
+        f"Bearer {client.post('/api/auth/login', json=creds).get_json()['access_token']}"
+
+    failures = 0
+
+    async def compare():
+        async with async_session() as session:
+            expenses = (await session.execute(select(Expense.user_id, Expense.timestamp, Expense.category,
+                                                     Expense.amount))).all()
+            rollups = (await session.execute(select(ExpenseRollup.user_id, ExpenseRollup.month, ExpenseRollup.category,
+                                                    ExpenseRollup.total, ExpenseRollup.count))).all()
+        expected = defaultdict(lambda: [0.0, 0])
+        for user_id, timestamp, category, amount in expenses:
+            for key in {category, ALL_CATEGORIES}:    # the real totals: each expense once per row
+                expected[(user_id, month_key(timestamp), key)][0] += amount
+                expected[(user_id, month_key(timestamp), key)][1] += 1
+        stored = {(u, m, c): (t, n) for u, m, c, t, n in rollups}
+        return {k: tuple(v) for k, v in expected.items()}, stored
+
+    def expect(name, res, status):
+        nonlocal failures
+        expected, stored = run_async(compare())
+        drift = {k: (stored.get(k), expected.get(k)) for k in set(expected) | set(stored)
+                 if stored.get(k) != expected.get(k)}
+        ok = res.status_code == status and not drift
+        failures += not ok
+        print("ok  " if ok else "FAIL", f"{name}: {res.status_code} (expected {status})"
+              + "".join(f"\n        rollup {k}: stored {got}, expenses say {want}" for k, (got, want) in drift.items()))
+
+    for day, (amount, category) in enumerate([(10, "food"), (12, "travel"), (20, "food"), (5, "rent")], 1):
+        expect(f"create {category}", client.post("/api/expense/create", json=dict(
+            amount=amount, categoryName=category, title=f"e{day}", date=f"2024-02-{day:02d}",
+        )), 200)
+    expect("create with blank category", client.post("/api/expense/create", json=dict(
+        amount=1, categoryName="  ", title="blank", date="2024-02-09",
+    )), 400)
+    expect("edit to '' category", client.put("/api/expense/update", json=dict(id=1, amount=15, categoryName="")), 400)
+    expect("edit to blank category", client.put("/api/expense/update", json=dict(id=1, amount=15, categoryName=" ")), 400)
+    expect("batch edit to blank category", client.put("/api/expense/batch/update", json=dict(
+        items=[dict(id=2, categoryName=" ")],
+    )), 400)
+    expect("edit", client.put("/api/expense/update", json=dict(id=1, amount=15, categoryName="rent")), 200)
+    expect("batch edit", client.put("/api/expense/batch/update", json=dict(
+        items=[dict(id=3, amount=7, date="2024-03-01")],
+    )), 200)
+    expect("delete", client.delete("/api/expense/delete", json=dict(id=4)), 200)
+
+    # a blank category that got past the controllers still counts once in the month total
+    delta = RollupDelta()
+    delta.add(1, datetime(2024, 2, 1), ALL_CATEGORIES, 5)
+    cells = dict(delta._cells)
+    ok = cells == {(1, '2024-02', ALL_CATEGORIES): [5.0, 1]}
+    failures += not ok
+    print("ok  " if ok else "FAIL", f"RollupDelta.add with the '' category: {cells}")
+
+    print(f"\n{failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# commands.py
+# Maintenance commands, run with e.g. `pipenv run flask --app app rebuild-rollups`
+import asyncio
+import click
+from utils.extensions import shards
+
+
+def run_async(coro):
+    """Run a coroutine from a (sync) click command and release pooled connections."""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            for database in shards.databases():
+                await database.dispose()
+    return asyncio.run(runner())
+
+
+async def for_each_database(step, *args):
+    """await step(engine, *args) on DATABASE_URL and then every other shard; {url: result}."""
+    results = {}
+    for database in shards.databases():
+        results[database.url.render_as_string(hide_password=True)] = await step(database, *args)
+    return results
+
+
+def register_commands(app):
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+    def rebuild_rollups_command(user_id):
+        """Backfill / repair the per-month expense rollup table."""
+        from utils.rollup import rebuild_rollups
+
+        async def rebuild():
+            indexes = [shards.shard_of(user_id)] if user_id is not None else range(shards.count)
+            for index in indexes:
+                async with shards.session(index) as session:
+                    await rebuild_rollups(session, user_id)
+                    await session.commit()
+
+        run_async(rebuild())
+        click.echo("Expense rollups rebuilt")
+
+    @app.cli.command('check-balances')
+    @click.option('--repair', is_flag=True, help='Recompute the drifted balances.')
+    def check_balances_command(repair):
+        """Compare user_balance with the expense table (and optionally fix it)."""
+        from utils.balance import find_drift, rebuild_balances
+
+        async def check():
+            drift = []
+            for index in range(shards.count):
+                async with shards.session(index) as session:
+                    found = await find_drift(session)
+                    if repair and found:
+                        await rebuild_balances(session, [user_id for user_id, _, _ in found])
+                        await session.commit()
+                drift += found
+            return drift
+
+        drift = run_async(check())
+        for user_id, stored, actual in drift:
+            click.echo(f"user {user_id}: stored spent/count {stored}, actual {actual}")
+        click.echo(f"{len(drift)} drifted balances" + (" repaired" if repair and drift else ""))
+        if drift and not repair:
+            raise SystemExit(1)
+
+    @app.cli.command('send-alerts')
+    @click.option('--once', is_flag=True, help='Drain what is due now and exit.')
+    def send_alerts_command(once):
+        """Deliver queued alert e-mails (normally done by the in-process dispatcher)."""
+        from utils.alert_dispatcher import AlertDispatcher
+        dispatcher = AlertDispatcher(app.config)
+
+        async def drain():
+            sent = 0
+            while True:
+                processed = await dispatcher.drain_once()
+                sent += processed
+                if processed < dispatcher.batch_size:
+                    break
+            dispatcher.close()
+            return sent
+
+        if once:
+            click.echo(f"Processed {run_async(drain())} alerts")
+        else:
+            run_async(dispatcher.run())
+
+    @app.cli.group('db')
+    def db_group():
+        """Versioned schema migrations (see migrations/)."""
+
+    def echo_per_database(results, describe):
+        for url, result in results.items():
+            click.echo(describe(result) if len(results) == 1 else f"{url}: {describe(result)}")
+
+    @db_group.command('upgrade')
+    @click.option('--to', 'target', type=int, default=None, help='Stop at this version.')
+    def db_upgrade(target):
+        """Apply pending migrations (on DATABASE_URL and every shard)."""
+        from utils.migrations import upgrade
+        results = run_async(for_each_database(upgrade, target))
+        echo_per_database(results, lambda applied: f"Applied {applied}" if applied else "Already up to date")
+
+    @db_group.command('downgrade')
+    @click.option('--to', 'target', type=int, required=True, help='Version to go back to (0 = empty).')
+    def db_downgrade(target):
+        """Revert migrations newer than --to (on DATABASE_URL and every shard)."""
+        from utils.migrations import downgrade
+        results = run_async(for_each_database(downgrade, target))
+        echo_per_database(results, lambda reverted: f"Reverted {reverted}" if reverted else "Nothing to revert")
+
+    @db_group.command('current')
+    def db_current():
+        from utils.migrations import current_version
+        echo_per_database(run_async(for_each_database(current_version)), str)
+
+    @app.cli.group('shards')
+    def shards_group():
+        """Expense shards (SHARD_URLS, see utils/shards.py)."""
+
+    @shards_group.command('list')
+    def shards_list():
+        """Each shard's URL and how many users it holds."""
+        from sqlalchemy import func, select
+        from models import UserBalance
+
+        async def count_users():
+            counts = []
+            for index in range(shards.count):
+                async with shards.session(index) as session:
+                    counts.append(await session.scalar(select(func.count()).select_from(UserBalance)))
+            return counts
+
+        for index, users in enumerate(run_async(count_users())):
+            url = shards.engine(index).url.render_as_string(hide_password=True)
+            click.echo(f"{index}: {url} ({users} users with expenses)")
+
+    @shards_group.command('rebalance')
+    @click.option('--from', 'retired', multiple=True, help='A database removed from SHARD_URLS to move users off.')
+    @click.option('--dry-run', is_flag=True, help='Only count the users that would move.')
+    def shards_rebalance(retired, dry_run):
+        """Move users whose rows are not on their shard. Stop writes while it runs."""
+        from utils.shards import rebalance
+        moves = run_async(rebalance(retired, dry_run=dry_run))
+        for (source, target), users in sorted(moves.items()):
+            click.echo(f"{source} -> {target}: {users} users" + (" would move" if dry_run else " moved"))
+        click.echo(f"{sum(moves.values())} users " + ("to move" if dry_run else "moved"))
@@ -1,17 +1,36 @@
-from flask import jsonify,g
+import jwt
+import logging
+import time
+from flask import jsonify, g, current_app
 from models import User
 from flask_jwt_extended import create_access_token, set_access_cookies, unset_jwt_cookies
 from sqlalchemy.exc import IntegrityError
 from utils.extensions import async_session  # an AsyncSession factory
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update
+from middlewares.auth_middleware import get_request_token, decode_token
+from utils.token_cache import token_digest, get_token_cache, get_revocations, store_revocation
+from utils.hashing import get_password_hasher, HasherBusy
+from utils.response_cache import invalidate_user
+from utils.shards import sync_user, USER_COPY_COLUMNS
+
+log = logging.getLogger(__name__)
+
+# what the profile endpoints read - never the password hash or the expenses
+PROFILE_COLUMNS = (User.id, User.username, User.email, User.description, User.income)
+
+
+def remember_new_token(access_token, user_id):
+    # just issued, so nothing can have revoked it: spare its first request the revoked_token lookup
+    exp = time.time() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+    get_token_cache(current_app).put(token_digest(access_token), str(user_id), exp)
+
 
 async def check_auth():
     userId = g.current_user
     async with async_session() as session:
-        stmt = select(User).where(User.id == userId)
+        stmt = select(*PROFILE_COLUMNS).where(User.id == userId)
         result = await session.execute(stmt)
-        rows = result.scalars().all()
+        rows = result.all()
 
     user_data = [
         {
@@ -38,25 +57,31 @@ async def register_user(data):
     try:
         async with async_session() as session:
             result = await session.execute(
-                User.__table__.select().where(User.username == username) # doing core-query and not ORM 
-                # compliant ----- :(
+                select(User.id).where(User.username == username)
             )
             if result.first():
                 return jsonify(msg="Username already exists"), 400
 
             new_user = User(username=username, email=email)
-            new_user.set_password(password)
+            # bcrypt runs on the hasher's thread pool, not on the event loop
+            new_user.password_hash = await get_password_hasher(current_app).hash(password)
             session.add(new_user)
+            await session.flush()
+            await sync_user(new_user)   # the copy on the user's expense shard, if that isn't this database
             await session.commit()
             access_token = create_access_token(identity=str(new_user.id))
 
     except IntegrityError:
         return jsonify(msg="Username already exists (race)"), 400
+
+    except HasherBusy:
+        return jsonify(msg="Server busy, try again shortly"), 503, {"Retry-After": "1"}
     
     except Exception as e:
         print(e)
         return jsonify(msg="Internal server error"), 500
 
+    remember_new_token(access_token, new_user.id)
     res =  jsonify(msg="User Registered Successfully", access_token=access_token)
     res.status_code = 201
     set_access_cookies(res, access_token)
@@ -73,30 +98,53 @@ async def login_user(data):
 
     try:
         async with async_session() as session:
+            # just the two columns login needs: one indexed lookup however long the history is
             result = await session.execute(
-                select(User)
-                .options(selectinload(User.expenses))
-                .where(User.username == username)
+                select(User.id, User.password_hash).where(User.username == username)
             )
-            user = result.scalars().one_or_none()
-            if not user or not user.check_password(password):
+            user = result.one_or_none()
+            hasher = get_password_hasher(current_app)
+            if not user or not await hasher.verify(password, user.password_hash):
                 return jsonify(msg="Invalid credentials"), 401
 
-            # Now this reflects the real number of expenses:
-            # print(f"user {user.username} has {(user.expenses[0].category)} expenses")
+            # BCRYPT_ROUNDS changed since this hash was made: upgrade it while we have the password
+            if hasher.needs_rehash(user.password_hash):
+                await session.execute(
+                    update(User).where(User.id == user.id).values(password_hash=await hasher.hash(password))
+                )
+                await session.commit()
 
             access_token = create_access_token(identity=str(user.id))
 
+    except HasherBusy:
+        return jsonify(msg="Server busy, try again shortly"), 503, {"Retry-After": "1"}
     except Exception as e:
         print(e)
         return jsonify(msg="Internal server error"), 500
-    print("Token of login", access_token)
+    remember_new_token(access_token, user.id)
     res = jsonify(msg="Logged in", access_token=access_token)
     set_access_cookies(res, access_token)
     return res, 200
 
 async def logout_user():
-    print("Hola")
+    # Really invalidate the token: it is refused from now until its own expiry,
+    # even if the client keeps a copy of it.
+    token = get_request_token()
+    if token:
+        try:
+            payload = decode_token(token)
+        except jwt.InvalidTokenError:
+            payload = None     # expired / garbage - nothing to revoke
+        if payload and payload.get('exp'):
+            digest = token_digest(token)
+            get_revocations(current_app).revoke(digest, payload['exp'])
+            get_token_cache(current_app).discard(digest)
+            try:
+                await store_revocation(digest, payload['exp'])   # the other workers
+            except Exception:
+                log.exception("storing revocation failed")
+                return jsonify(msg="Internal server error"), 500
+
     res = jsonify(success=True, msg="User logged out successfully")
     unset_jwt_cookies(res)
     return res, 200
@@ -107,30 +155,37 @@ async def updateProfile(data):
     new_email    = data.get("email")
     new_description = data.get("description")
     new_target = data.get("target")
-    print("Hola")
-    
+
     if not new_username and not new_email and new_description and new_target:
         return jsonify(msg="Fields are required to update"), 400
 
+    # Update fields - a single UPDATE, the row is never loaded
+    changes = {}
+    if new_username:
+        changes["username"] = new_username
+    if new_email:
+        changes["email"] = new_email
+    if new_description:
+        changes["description"] = new_description
+    if new_target:
+        changes["income"] = str(new_target)    # a String column; asyncpg won't coerce numbers
+    if not changes:
+        return jsonify(msg="Fields are required to update"), 400
+
     try:
         async with async_session() as session:
-            result = await session.execute(select(User).where(User.id == user_id))
-            user = result.scalar_one_or_none()
-
-            if not user:
+            result = await session.execute(
+                update(User).where(User.id == user_id).values(**changes)
+                .returning(*USER_COPY_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+            user = result.one_or_none()
+            if user is None:
                 return jsonify(msg="User not found"), 404
 
-            # Update fields
-            if new_username:
-                user.username = new_username
-            if new_email:
-                user.email = new_email
-            if new_description:
-                user.description = new_description
-            if new_target:
-                user.income = new_target
-
+            await sync_user(user)
             await session.commit()
+            await invalidate_user(user_id)
 
             return jsonify(msg="Profile updated successfully"), 200
 
@@ -1,40 +1,91 @@
-from flask import jsonify, g
+import csv
+import io
+from flask import jsonify, g, current_app, Response
 from datetime import datetime, timedelta
-from collections import defaultdict
-from sqlalchemy import select, desc
-from models import Expense
-from utils.extensions import async_session
+from sqlalchemy import select, desc, tuple_, insert, func, update, delete, bindparam
+from models import Expense, ExpenseRollup
+from utils.extensions import shard_session
 from utils.alert_user import check_and_notify
+from utils.rollup import RollupDelta, ALL_CATEGORIES
+from utils.periods import PERIODS, bucket_expr, bucket_labels
+from utils.search import apply_search, search_terms, supports_search
+from utils.json_response import dumps, json_response, rows_to_dicts
+from utils.pagination import encode_cursor, decode_cursor, encode_offset, decode_offset, page_size
+from utils.importer import detect_format, iter_records
+from utils.streaming import iter_async, gzip_chunks
+from utils.event_loop import get_persistent_loop
+from utils.response_cache import invalidate_user
+from utils.group_commit import get_group_committer
 
 # ------------------------- CREATE -------------------------
-async def create_expense(data):
-    amount = int(data.get('amount'))
+def valid_category(category):
+    """False for '' / whitespace: '' is the month-total key in expense_rollup (ALL_CATEGORIES)."""
+    return bool(str(category).strip())
+
+
+def validate_expense(data):
+    """Check one incoming expense (create / bulk import) and return the Expense column values.
+
+    Raises ValueError with the message to send back to the client.
+    """
+    try:
+        amount = int(data.get('amount'))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid amount")
     categoryName = data.get('categoryName')
     title = data.get("title")
     date_str = data.get("date")  # expected format: "YYYY-MM-DD"
-    
+
     if not amount or not categoryName or not title or not date_str:
-        return jsonify(msg="Data is missing"), 400
+        raise ValueError("Data is missing")
+    if not valid_category(categoryName):
+        raise ValueError("categoryName can't be empty")
+
+    try:
+        timestamp = datetime.strptime(date_str, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date, expected YYYY-MM-DD")
+
+    return {"title": title, "amount": amount, "category": categoryName, "timestamp": timestamp}
+
+
+async def create_expense(data):
+    try:
+        fields = validate_expense(data)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    amount, categoryName, title, timestamp = (
+        fields["amount"], fields["category"], fields["title"], fields["timestamp"]
+    )
 
     userId = g.current_user
     if not userId:
         return jsonify(msg="Unauthorized user"), 401
 
     try:
-        # ✅ Parse date string to datetime object
-        timestamp = datetime.strptime(date_str, "%Y-%m-%d")
+        committer = get_group_committer(current_app._get_current_object(), userId)
+        if committer is not None:
+            # shares one transaction with the creates arriving alongside it
+            expense_id = await committer.submit({**fields, "user_id": int(userId)})
+        else:
+            async with shard_session(userId) as session:
+                newExpense = Expense(
+                    title=title,
+                    amount=amount,
+                    category=categoryName,
+                    timestamp=timestamp,
+                    user_id=userId
+                )
+                session.add(newExpense)
 
-        async with async_session() as session:
-            newExpense = Expense(
-                title=title,
-                amount=amount,
-                category=categoryName,
-                timestamp=timestamp,
-                user_id=userId
-            )
-            session.add(newExpense)
-            await session.commit()
-            await check_and_notify(userId, session)
+                rollup = RollupDelta()
+                rollup.add(userId, timestamp, categoryName, amount)
+                await rollup.flush(session)
+
+                await check_and_notify(userId, session)
+                await session.commit()
+            expense_id = newExpense.id
+        await invalidate_user(userId)
 
     except Exception as e:
         print(e)
@@ -44,7 +95,7 @@ async def create_expense(data):
         success=True,
         msg="Expense added successfully",
         expense={
-            "id": newExpense.id,
+            "id": expense_id,
             "amount": amount,
             "category": categoryName,
             "title": title,
@@ -53,29 +104,415 @@ async def create_expense(data):
     ), 200
 
 
+# ------------------------- BULK IMPORT -------------------------
+async def _insert_batch(userId, batch):
+    """Insert one batch of validated rows (plus their rollup deltas) in a single transaction."""
+    async with shard_session(userId) as session:
+        await session.execute(insert(Expense), batch)
+        rollup = RollupDelta()
+        for row in batch:
+            rollup.add(userId, row["timestamp"], row["category"], row["amount"])
+        await rollup.flush(session)
+        await session.commit()
+    await invalidate_user(userId)
+
+
+async def import_expenses(stream, fmt, content_type):
+    """Stream a CSV / NDJSON upload into the expense table.
+
+    Rows are validated like create_expense, inserted IMPORT_BATCH_SIZE at a
+    time and the savings threshold is checked once at the end. Only one batch
+    is held in memory, so file size does not matter.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized user"), 401
+
+    fmt = detect_format(fmt, content_type)
+    if not fmt:
+        return jsonify(msg="Send text/csv or application/x-ndjson (or pass ?format=csv|ndjson)"), 400
+
+    batch_size = current_app.config["IMPORT_BATCH_SIZE"]
+    max_errors = current_app.config["IMPORT_MAX_ERRORS"]
+    imported, failed, errors, batch = 0, 0, [], []
+
+    try:
+        for row_number, record in iter_records(stream, fmt):
+            try:
+                if record is None:
+                    raise ValueError("Malformed row")
+                fields = validate_expense(record)
+            except ValueError as e:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({"row": row_number, "error": str(e)})
+                continue
+
+            fields["user_id"] = userId
+            batch.append(fields)
+            if len(batch) >= batch_size:
+                await _insert_batch(userId, batch)
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            await _insert_batch(userId, batch)
+            imported += len(batch)
+
+        async with shard_session(userId) as session:
+            await check_and_notify(userId, session)
+            await session.commit()
+
+    except UnicodeDecodeError:
+        return jsonify(msg="File must be UTF-8", imported=imported), 400
+    except Exception as e:
+        print("Error in import_expenses:", e)
+        # batches already committed stay imported
+        return jsonify(msg="Internal server error", imported=imported), 500
+
+    return jsonify(success=True, imported=imported, failed=failed, errors=errors), 200
+
+
 # ------------------------- READ -------------------------
-async def read_expense():
+EXPENSE_FIELDS = ("id", "title", "amount", "category", "timestamp")
+
+
+def expense_columns(fields=EXPENSE_FIELDS):
+    """Columns to select for `fields`, in that order.
+
+    id and timestamp are appended when not asked for (cursors are built from
+    them); rows_to_dicts() drops such trailing extras.
+    """
+    columns = [getattr(Expense, f) for f in fields]
+    columns += [getattr(Expense, f) for f in ("id", "timestamp") if f not in fields]
+    return columns
+
+
+def _parse_filters(args):
+    """Turn ?from=YYYY-MM-DD&to=YYYY-MM-DD&category=... into WHERE clauses (dates inclusive)."""
+    filters = []
+    date_from = args.get("from")
+    date_to = args.get("to")
+    category = args.get("category")
+
+    if date_from:
+        filters.append(Expense.timestamp >= datetime.strptime(date_from, "%Y-%m-%d"))
+    if date_to:
+        filters.append(Expense.timestamp < datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1))
+    if category:
+        filters.append(Expense.category == category)
+    return filters
+
+
+async def read_expense(args):
+    """One page of the user's expenses, newest first.
+
+    Query params: limit, cursor (from the previous page's next_cursor),
+    from / to / category filters and fields=id,title,... to trim the payload.
+    Pages are keyed on (timestamp, id), so deep pages are as cheap as the first.
+    """
     userId = g.current_user
     if not userId:
         return jsonify(msg="Unauthorized"), 401
 
-    async with async_session() as session:
-        stmt = select(Expense).where(Expense.user_id == userId)
-        result = await session.execute(stmt)
-        rows = result.scalars().all()
-
-    expenses = [
-        {
-            "id": e.id,
-            "title": e.title,
-            "amount": e.amount,
-            "category": e.category,
-            "timestamp": e.timestamp.isoformat()
-        }
-        for e in rows
+    try:
+        limit = page_size(args.get("limit"))
+        filters = _parse_filters(args)
+        fields = [f for f in (args.get("fields") or "").split(",") if f] or list(EXPENSE_FIELDS)
+        if any(f not in EXPENSE_FIELDS for f in fields):
+            return jsonify(msg=f"fields must be among {', '.join(EXPENSE_FIELDS)}"), 400
+
+        cursor = args.get("cursor")
+        if cursor:
+            last_ts, last_id = decode_cursor(cursor)
+            filters.append(tuple_(Expense.timestamp, Expense.id) < tuple_(last_ts, last_id))
+    except ValueError:
+        return jsonify(msg="Invalid limit, cursor or date"), 400
+
+    async with shard_session(userId) as session:
+        stmt = (
+            select(*expense_columns(fields))
+            .where(Expense.user_id == userId, *filters)
+            .order_by(desc(Expense.timestamp), desc(Expense.id))
+            .limit(limit + 1)
+        )
+        rows = (await session.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+    return json_response({"expenses": rows_to_dicts(rows, fields), "next_cursor": next_cursor})
+
+
+# ------------------------- SEARCH -------------------------
+SEARCH_PAGE_SIZE = 20
+
+
+async def search_expenses(args):
+    """Expenses whose title or category matches ?q=, best match first.
+
+    Every word is a prefix and all must match; title matches rank above
+    category-only ones, then newest first. from / to / category filter as in
+    read_expense; limit / cursor page through the ranked list. The first page
+    also carries the total amount and count of all matches. The lookup only
+    reads this user's part of the full-text index (utils/search.py), so the
+    size of the table does not matter.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized"), 401
+
+    terms = search_terms(args.get("q"))
+    if not terms:
+        return jsonify(msg="q needs a word of at least 2 characters"), 400
+    try:
+        limit = page_size(args.get("limit"), SEARCH_PAGE_SIZE)
+        filters = _parse_filters(args)
+        cursor = args.get("cursor")
+        offset = decode_offset(cursor) if cursor else 0
+    except ValueError:
+        return jsonify(msg="Invalid limit, cursor or date"), 400
+
+    try:
+        async with shard_session(userId) as session:
+            dialect = session.get_bind().dialect.name
+            if not supports_search(dialect):
+                return jsonify(msg="Search is not available on this database"), 501
+
+            stmt, title_hit = apply_search(
+                select(*expense_columns()).where(Expense.user_id == userId, *filters), dialect, userId, terms
+            )
+            rows = (await session.execute(
+                stmt.order_by(desc(title_hit), desc(Expense.timestamp), desc(Expense.id))
+                .offset(offset).limit(limit + 1)
+            )).all()
+
+            summary = None
+            if not offset:
+                matched, _ = apply_search(
+                    select(func.sum(Expense.amount), func.count()).where(Expense.user_id == userId, *filters),
+                    dialect, userId, terms,
+                )
+                total, count = (await session.execute(matched)).one()
+                summary = {"total": _money(total), "count": count}
+
+    except Exception as e:
+        print("Error in search_expenses:", e)
+        return jsonify(msg="Internal server error"), 500
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_offset(offset + limit)
+
+    return json_response({
+        "expenses": rows_to_dicts(rows, EXPENSE_FIELDS),
+        "summary": summary,
+        "next_cursor": next_cursor,
+    })
+
+
+# ------------------------- ANALYTICS -------------------------
+def _money(value):
+    return round(value or 0, 2)
+
+
+async def expense_analytics(args):
+    """Totals, counts and averages per day / week / month and per category.
+
+    Query params: period=day|week|month (default month), from / to / category
+    filters and top=N (default 5) for the top categories. Everything is
+    aggregated with GROUP BY in SQL, so the response grows with the number of
+    buckets, not with the number of expenses.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized"), 401
+
+    period = (args.get("period") or "month").lower()
+    if period not in PERIODS:
+        return jsonify(msg=f"period must be one of {', '.join(PERIODS)}"), 400
+    try:
+        filters = _parse_filters(args)
+        top = int(args.get("top", 5))
+        if top < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify(msg="Invalid date or top"), 400
+
+    where = (Expense.user_id == userId, *filters)
+    total, count, average = func.sum(Expense.amount), func.count(), func.avg(Expense.amount)
+
+    try:
+        async with shard_session(userId) as session:
+            bucket = bucket_expr(session.get_bind().dialect.name, period, Expense.timestamp).label("bucket")
+
+            summary = (await session.execute(
+                select(total, count, average).where(*where)
+            )).one()
+            buckets = (await session.execute(
+                select(bucket, total, count, average).where(*where).group_by(bucket).order_by(bucket)
+            )).all()
+            categories = (await session.execute(
+                select(Expense.category, total, count, average).where(*where)
+                .group_by(Expense.category).order_by(desc(total))
+            )).all()
+            breakdown = (await session.execute(
+                select(bucket, Expense.category, total, count).where(*where)
+                .group_by(bucket, Expense.category).order_by(bucket, desc(total))
+            )).all()
+
+    except Exception as e:
+        print("Error in expense_analytics:", e)
+        return jsonify(msg="Internal server error"), 500
+
+    def stats(row_total, row_count, row_average):
+        return {"total": _money(row_total), "count": row_count, "average": _money(row_average)}
+
+    by_category = [{"category": c, **stats(t, n, a)} for c, t, n, a in categories]
+    return jsonify(
+        period=period,
+        summary=stats(*summary),
+        buckets=[{"period": b, **stats(t, n, a)} for b, t, n, a in buckets],
+        categories=by_category,
+        top_categories=by_category[:top],
+        breakdown=[{"period": b, "category": c, "total": _money(t), "count": n} for b, c, t, n in breakdown],
+    ), 200
+
+
+async def expense_series(args):
+    """Zero-filled totals and counts per day / week / month, ready to chart.
+
+    Query params: period=day|week|month (default day), from / to (YYYY-MM-DD,
+    inclusive; default the last SERIES_DEFAULT_DAYS days up to today) and
+    category. Sums are grouped in SQL off the (user_id, timestamp) index and
+    every bucket in the range is returned, empty ones with 0 - one entry per
+    bucket, at most SERIES_MAX_BUCKETS, however many expenses there are.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized"), 401
+
+    period = (args.get("period") or "day").lower()
+    if period not in PERIODS:
+        return jsonify(msg=f"period must be one of {', '.join(PERIODS)}"), 400
+    try:
+        last = datetime.strptime(args["to"], "%Y-%m-%d").date() if args.get("to") else datetime.utcnow().date()
+        if args.get("from"):
+            first = datetime.strptime(args["from"], "%Y-%m-%d").date()
+        else:
+            first = last - timedelta(days=current_app.config["SERIES_DEFAULT_DAYS"] - 1)
+    except ValueError:
+        return jsonify(msg="Invalid date, expected YYYY-MM-DD"), 400
+    if first > last:
+        return jsonify(msg="from must not be after to"), 400
+    try:
+        labels = bucket_labels(period, first, last, limit=current_app.config["SERIES_MAX_BUCKETS"])
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    where = [
+        Expense.user_id == userId,
+        Expense.timestamp >= datetime.combine(first, datetime.min.time()),
+        Expense.timestamp < datetime.combine(last + timedelta(days=1), datetime.min.time()),
     ]
+    category = args.get("category")
+    if category:
+        where.append(Expense.category == category)
+
+    try:
+        async with shard_session(userId) as session:
+            bucket = bucket_expr(session.get_bind().dialect.name, period, Expense.timestamp).label("bucket")
+            rows = (await session.execute(
+                select(bucket, func.sum(Expense.amount), func.count()).where(*where).group_by(bucket)
+            )).all()
+    except Exception as e:
+        print("Error in expense_series:", e)
+        return jsonify(msg="Internal server error"), 500
+
+    sums = {b: (t, n) for b, t, n in rows}
+    series = []
+    for label in labels:
+        total, count = sums.get(label, (0, 0))
+        series.append({"period": label, "total": _money(total), "count": count})
+    return json_response({
+        "period": period,
+        "from": first.isoformat(),
+        "to": last.isoformat(),
+        "category": category,
+        "total": _money(sum(point["total"] for point in series)),
+        "count": sum(point["count"] for point in series),
+        "series": series,
+    })
+
+
+# ------------------------- EXPORT -------------------------
+EXPORT_COLUMNS = ("id", "title", "amount", "category", "timestamp")
+
+
+def _encode_csv(rows, header=False):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows((r.id, r.title, r.amount, r.category, r.timestamp.isoformat()) for r in rows)
+    return buf.getvalue().encode("utf-8")
 
-    return jsonify(expenses=expenses), 200
+
+def _encode_ndjson(rows):
+    return b"".join(dumps(record) + b"\n" for record in rows_to_dicts(rows, EXPORT_COLUMNS))
+
+
+async def export_expenses(args, accept_encoding):
+    """Stream all of the user's expenses (optionally filtered) as CSV or NDJSON.
+
+    Rows come off a server-side cursor EXPORT_CHUNK_ROWS at a time and are
+    written straight into the chunked response, gzipped on the fly when the
+    client accepts it - memory use does not depend on the number of rows.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized user"), 401
+
+    fmt = (args.get("format") or "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify(msg="format must be csv or ndjson"), 400
+    try:
+        filters = _parse_filters(args)
+    except ValueError:
+        return jsonify(msg="Invalid date, expected YYYY-MM-DD"), 400
+
+    chunk_rows = current_app.config["EXPORT_CHUNK_ROWS"]
+    stmt = (
+        select(Expense.id, Expense.title, Expense.amount, Expense.category, Expense.timestamp)
+        .where(Expense.user_id == userId, *filters)
+        .order_by(Expense.timestamp, Expense.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+
+    async def chunks():
+        async with shard_session(userId) as session:
+            result = await session.stream(stmt)
+            first = True
+            async for rows in result.partitions():
+                yield _encode_csv(rows, header=first) if fmt == "csv" else _encode_ndjson(rows)
+                first = False
+            if first and fmt == "csv":
+                yield _encode_csv([], header=True)
+
+    body = iter_async(chunks(), get_persistent_loop(current_app))
+    headers = {
+        "Content-Disposition": f"attachment; filename=expenses.{fmt}",
+        "Vary": "Accept-Encoding",
+    }
+    if args.get("gzip") != "0" and "gzip" in (accept_encoding or ""):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(body, mimetype=mimetype, headers=headers)
 
 
 # ------------------------- EDIT -------------------------
@@ -88,13 +525,15 @@ async def edit_expense(data):
 
     if not any([amount, categoryName, title, date_str]):
         return jsonify(msg="Fields to update are missing"), 400
+    if categoryName is not None and not valid_category(categoryName):
+        return jsonify(msg="categoryName can't be empty"), 400
 
     userId = g.current_user
     if not userId:
         return jsonify(msg="Unauthorized user"), 401
 
     try:
-        async with async_session() as session:
+        async with shard_session(userId) as session:
             result = await session.execute(
                 select(Expense).where(
                     Expense.id == expense_id,
@@ -103,6 +542,9 @@ async def edit_expense(data):
             )
             expense = result.scalars().one()
 
+            rollup = RollupDelta()
+            rollup.remove(userId, expense.timestamp, expense.category, expense.amount)
+
             if amount is not None:
                 expense.amount = amount
             if categoryName is not None:
@@ -113,8 +555,12 @@ async def edit_expense(data):
                 # ✅ Convert date string to datetime
                 expense.timestamp = datetime.strptime(date_str, "%Y-%m-%d")
 
-            await session.commit()
+            rollup.add(userId, expense.timestamp, expense.category, expense.amount)
+            await rollup.flush(session)
+
             await check_and_notify(userId, session)
+            await session.commit()
+        await invalidate_user(userId)
 
     except Exception as e:
         print(e)
@@ -143,13 +589,18 @@ async def delete_expense(data):
         return jsonify(msg="Unauthorized user"), 401
 
     try:
-        async with async_session() as session:
+        async with shard_session(userId) as session:
             result = await session.get(Expense, expense_id)
             if not result or int(result.user_id) != int(userId):
                 return jsonify(msg="No such expense exists"), 404
 
+            rollup = RollupDelta()
+            rollup.remove(userId, result.timestamp, result.category, result.amount)
+            await rollup.flush(session)
+
             await session.delete(result)
             await session.commit()
+        await invalidate_user(userId)
 
     except Exception as e:
         print(e)
@@ -158,35 +609,212 @@ async def delete_expense(data):
     return jsonify(success=True, msg="Expense deleted successfully"), 200
 
 
+# ------------------------- BATCH UPDATE / DELETE -------------------------
+# request key -> Expense column, for partial updates
+PATCH_FIELDS = {"amount": "amount", "categoryName": "category", "title": "title", "date": "timestamp"}
+IN_CHUNK = 500     # ids per IN (...) list; SQLite caps bound parameters per statement
+
+
+def validate_patch(data):
+    """Column values for the fields present in `data` (batch update). Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Each patch must be an object")
+    values = {}
+    for key, column in PATCH_FIELDS.items():
+        value = data.get(key)
+        if value is None:
+            continue
+        if key == "amount":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid amount")
+            if not value:
+                raise ValueError("Invalid amount")
+        elif key == "date":
+            try:
+                value = datetime.strptime(value, "%Y-%m-%d")
+            except (TypeError, ValueError):
+                raise ValueError("Invalid date, expected YYYY-MM-DD")
+        elif not value or (key == "categoryName" and not valid_category(value)):
+            raise ValueError(f"{key} can't be empty")
+        values[column] = value
+    if not values:
+        raise ValueError("Fields to update are missing")
+    return values
+
+
+def _batch_ids(ids):
+    max_items = current_app.config["BATCH_MAX_ITEMS"]
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("Send a non-empty list of ids")
+    if len(ids) > max_items:
+        raise ValueError(f"At most {max_items} ids per batch")
+    try:
+        return list(dict.fromkeys(int(i) for i in ids))
+    except (TypeError, ValueError):
+        raise ValueError("ids must be integers")
+
+
+def _batch_filter(flt):
+    if not isinstance(flt, dict):
+        raise ValueError("filter must be an object")
+    filters = _parse_filters(flt)
+    if not filters:
+        raise ValueError("filter needs at least one of category, from, to")
+    return filters
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), IN_CHUNK):
+        yield ids[i:i + IN_CHUNK]
+
+
+async def batch_update_expenses(data):
+    """Update many expenses in one transaction.
+
+    Either {"items": [{"id": 1, "amount": ..., "categoryName": ..., "title": ..., "date": ...}, ...]}
+    with a patch per id, or {"filter": {"category"/"from"/"to"}, "set": {...}} applying one
+    patch to every match. Writes are set-based UPDATEs (one executemany per patch shape),
+    rollups move by the summed deltas and the savings threshold is checked once.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized user"), 401
+
+    items, flt = data.get("items"), data.get("filter")
+    if (items is None) == (flt is None):
+        return jsonify(msg="Send either items or filter + set"), 400
+    try:
+        if items is not None:
+            if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                raise ValueError("items must be a list of objects")
+            ids = _batch_ids([item.get("id") for item in items])
+            patches = {int(item["id"]): validate_patch(item) for item in items}
+            scope = [Expense.id.in_(ids)]
+        else:
+            patch = validate_patch(data.get("set"))
+            scope = _batch_filter(flt)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    try:
+        async with shard_session(userId) as session:
+            # the rows we account for are exactly the rows we update (locked on Postgres)
+            rows = (await session.execute(
+                select(Expense.id, Expense.amount, Expense.category, Expense.timestamp)
+                .where(Expense.user_id == userId, *scope)
+                .with_for_update()
+            )).all()
+
+            rollup = RollupDelta()
+            by_shape = {}
+            for row in rows:
+                values = patches[row.id] if items is not None else patch
+                rollup.remove(userId, row.timestamp, row.category, row.amount)
+                rollup.add(
+                    userId,
+                    values.get("timestamp", row.timestamp),
+                    values.get("category", row.category),
+                    values.get("amount", row.amount),
+                )
+                by_shape.setdefault(tuple(sorted(values)), []).append({"b_id": row.id, **values})
+
+            table = Expense.__table__
+            if items is not None:
+                for columns, params in by_shape.items():
+                    await session.execute(
+                        update(table)
+                        .where(table.c.id == bindparam("b_id"), table.c.user_id == userId)
+                        .values({c: bindparam(c) for c in columns}),
+                        params,
+                    )
+            else:
+                # ids come from the user-scoped SELECT above, in this transaction
+                for chunk in _chunks([row.id for row in rows]):
+                    await session.execute(update(table).where(table.c.id.in_(chunk)).values(**patch))
+
+            await rollup.flush(session)
+            await check_and_notify(userId, session)
+            await session.commit()
+        await invalidate_user(userId)
+
+    except Exception as e:
+        print("Error in batch_update_expenses:", e)
+        return jsonify(msg="Internal server error"), 500
+
+    found = {row.id for row in rows}
+    not_found = [i for i in ids if i not in found] if items is not None else []
+    return jsonify(success=True, updated=len(rows), not_found=not_found), 200
+
+
+async def batch_delete_expenses(data):
+    """Delete many expenses in one transaction: {"ids": [...]} or {"filter": {...}}.
+
+    Each DELETE ... RETURNING hands back the removed rows, so the rollup deltas
+    need no extra SELECT.
+    """
+    userId = g.current_user
+    if not userId:
+        return jsonify(msg="Unauthorized user"), 401
+
+    ids, flt = data.get("ids"), data.get("filter")
+    if (ids is None) == (flt is None):
+        return jsonify(msg="Send either ids or filter"), 400
+    try:
+        if ids is not None:
+            ids = _batch_ids(ids)
+            scopes = [[Expense.id.in_(chunk)] for chunk in _chunks(ids)]
+        else:
+            scopes = [_batch_filter(flt)]
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    deleted = []
+    try:
+        async with shard_session(userId) as session:
+            for scope in scopes:
+                result = await session.execute(
+                    delete(Expense)
+                    .where(Expense.user_id == userId, *scope)
+                    .returning(Expense.id, Expense.amount, Expense.category, Expense.timestamp)
+                    .execution_options(synchronize_session=False)
+                )
+                deleted.extend(result.all())
+
+            rollup = RollupDelta()
+            for row in deleted:
+                rollup.remove(userId, row.timestamp, row.category, row.amount)
+            await rollup.flush(session)
+            await session.commit()
+        await invalidate_user(userId)
+
+    except Exception as e:
+        print("Error in batch_delete_expenses:", e)
+        return jsonify(msg="Internal server error"), 500
+
+    found = {row.id for row in deleted}
+    not_found = [i for i in ids if i not in found] if ids is not None else []
+    return jsonify(success=True, deleted=len(deleted), not_found=not_found), 200
+
+
 # ------------------------- RECENT 6 -------------------------
 async def recent_6_expense():
     userId = g.current_user
     if not userId:
         return jsonify(msg="Unauthorized"), 401
 
-    async with async_session() as session:
+    async with shard_session(userId) as session:
         try:
             stmt = (
-                select(Expense)
+                select(*expense_columns())
                 .where(Expense.user_id == userId)
                 .order_by(desc(Expense.timestamp))
                 .limit(6)
             )
-            result = await session.execute(stmt)
-            rows = result.scalars().all()
-
-            recent_expenses = [
-                {
-                    "id": e.id,
-                    "title": e.title,
-                    "amount": e.amount,
-                    "category": e.category,
-                    "timestamp": e.timestamp.isoformat()
-                }
-                for e in rows
-            ]
-
-            return jsonify(expenses=recent_expenses), 200
+            rows = (await session.execute(stmt)).all()
+
+            return json_response({"expenses": rows_to_dicts(rows, EXPENSE_FIELDS)})
 
         except Exception as e:
             print("Error in recent_6_expense:", e)
@@ -201,31 +829,19 @@ async def recentThreeMonthExpense():
 
     cutoff = datetime.utcnow() - timedelta(days=90)
 
-    async with async_session() as session:
+    async with shard_session(userId) as session:
         try:
             stmt = (
-                select(Expense)
+                select(*expense_columns())
                 .where(
                     Expense.user_id == userId,
                     Expense.timestamp >= cutoff
                 )
                 .order_by(desc(Expense.timestamp))
             )
-            result = await session.execute(stmt)
-            rows = result.scalars().all()
-
-            recent_expenses = [
-                {
-                    "id": e.id,
-                    "title": e.title,
-                    "amount": e.amount,
-                    "category": e.category,
-                    "timestamp": e.timestamp.isoformat()
-                }
-                for e in rows
-            ]
-
-            return jsonify(expenses=recent_expenses), 200
+            rows = (await session.execute(stmt)).all()
+
+            return json_response({"expenses": rows_to_dicts(rows, EXPENSE_FIELDS)})
 
         except Exception as e:
             print("Error in recentThreeMonthExpense:", e)
@@ -234,21 +850,18 @@ async def recentThreeMonthExpense():
 
 async def latest_month_total():
     user_id = g.current_user
-    async with async_session() as session:
-        stmt = select(Expense).where(Expense.user_id == user_id)
-        result = await session.execute(stmt)
-        expenses = result.scalars().all()
-
-    # Group and get the latest month
-
-    month_map = defaultdict(list)
-    for e in expenses:
-        key = e.timestamp.strftime('%Y-%m')  # '2024-07' format
-        month_map[key].append(e.amount)
-
-    if not month_map:
-        return jsonify(total=0), 200
+    # expense_rollup keeps a running total per month, so this is one row
+    # no matter how much history the user has
+    async with shard_session(user_id) as session:
+        stmt = (
+            select(ExpenseRollup.total)
+            .where(
+                ExpenseRollup.user_id == user_id,
+                ExpenseRollup.category == ALL_CATEGORIES
+            )
+            .order_by(desc(ExpenseRollup.month))
+            .limit(1)
+        )
+        total = (await session.execute(stmt)).scalar_one_or_none()
 
-    latest_month = max(month_map.keys())  # latest 'YYYY-MM'
-    total = sum(month_map[latest_month])
-    return jsonify(total=total), 200
\ No newline at end of file
+    return jsonify(total=total or 0), 200
@@ -1,44 +1,81 @@
 import jwt
+import logging
 from functools import wraps
 from flask import jsonify, request, current_app, g
+from utils.token_cache import token_digest, get_token_cache, get_revocations, is_revoked_in_database
+
+log = logging.getLogger(__name__)
+
+
+def get_request_token():
+    """Bearer token from the Authorization header, else the access-token cookie."""
+    auth = request.headers.get('Authorization', None)
+    if auth:
+        parts = auth.split()
+        if len(parts)==2 and parts[0].lower() == 'bearer':
+            return parts[1]
+
+    return request.cookies.get(
+        current_app.config.get('JWT_ACCESS_COOKIE_NAME')
+    )
+
+
+def decode_token(token):
+    return jwt.decode(
+        token,
+        current_app.config['JWT_SECRET_KEY'],
+        algorithms=[ current_app.config.get('JWT_ALGORITHM', 'HS256') ]
+    )
+
 
 def protectRoute(f):
     @wraps(f)
     async def wrapper(*args, **kwargs):
-        token = None
-
-        auth = request.headers.get('Authorization', None)
-        if auth:
-            parts = auth.split()
-            if len(parts)==2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-        
-        if not token:
-            token = request.cookies.get(
-                current_app.config.get('JWT_ACCESS_COOKIE_NAME')
-            )
-        
+        token = get_request_token()
         if not token:
-            print("Kya be")
+            log.info("auth rejected reason=missing_token path=%s", request.path)
             return jsonify(msg="Unauthorized user kyu aa raha"), 401
-        
-        print("token here ", token)
 
+        digest = token_digest(token)
+        revocations = get_revocations(current_app)
+        if revocations.is_revoked(digest):
+            log.info("auth rejected reason=revoked path=%s", request.path)
+            return jsonify(msg="Token has been revoked"), 401
+
+        # verified (and looked up in revoked_token) in the last few seconds -> skip both
+        cache = get_token_cache(current_app)
+        user_id = cache.get(digest)
+        if user_id is None:
+            try:
+                payload = decode_token(token)
+            except jwt.ExpiredSignatureError:
+                log.info("auth rejected reason=expired path=%s", request.path)
+                return jsonify(msg="Token has expired"), 401
+            except jwt.InvalidTokenError:
+                log.info("auth rejected reason=invalid path=%s", request.path)
+                return jsonify(msg="Invalid token"), 401
+
+            # logged out through another worker?
+            try:
+                revoked = await is_revoked_in_database(digest)
+            except Exception:
+                log.exception("revocation lookup failed")
+                return jsonify(msg="Internal server error"), 500
+            if revoked:
+                revocations.revoke(digest, payload['exp'])
+                log.info("auth rejected reason=revoked path=%s", request.path)
+                return jsonify(msg="Token has been revoked"), 401
+
+            user_id = payload.get('sub')
+            cache.put(digest, user_id, payload.get('exp'))
+            log.debug("auth verified user_id=%s cache=miss", user_id)
+
+        # sub is a string; the user_id / id columns are integers and asyncpg won't coerce
         try:
-            payload = jwt.decode(
-                token,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=[ current_app.config.get('JWT_ALGORITHM', 'HS256') ]
-            )
-            print("Dip", payload)
-        
-        except jwt.ExpiredSignatureError:
-            print("Token expired")
-            return jsonify(msg="Token has expired"), 401
-        except jwt.InvalidTokenError:
+            g.current_user = int(user_id)
+        except (TypeError, ValueError):
+            log.info("auth rejected reason=invalid_subject path=%s", request.path)
             return jsonify(msg="Invalid token"), 401
-        
-        g.current_user = payload.get('sub')
 
         return await f(*args, **kwargs)
         # without await, and using async in function, a coroutine object is returned and not the result.
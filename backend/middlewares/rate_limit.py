@@ -0,0 +1,161 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import jsonify, request, current_app, g
+from utils.metrics import RATE_LIMITED
+
+log = logging.getLogger(__name__)
+
+
+class TokenBuckets:
+    """One token bucket per key (user id, IP): `capacity` requests, refilled at `rate` per second.
+
+    Buckets are created full and kept in an LRU of `maxsize` keys; a key that
+    falls out simply starts full again. Every check is a dict lookup and a
+    bit of arithmetic under one lock.
+    """
+
+    def __init__(self, capacity, period, maxsize):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()     # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """0 if a request for `key` may go ahead (and uses a token), else seconds until it may."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+    def refund(self, key):
+        """Give back the token take() used, when a later limit turned the request away anyway."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.capacity, bucket[0] + 1)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimit:
+    """At most `limit` requests of a route in flight at once; the rest are turned away, not queued."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class RouteLimits:
+    """The limits of one route, parsed from a RATE_LIMIT_<NAME> setting like "user=20/1 ip=60/1 concurrency=16".
+
+    user=N/S and ip=N/S allow bursts of N requests and N per S seconds after
+    that, per user / per client IP; concurrency=N caps the requests in flight.
+    Leave a part out to not limit on it.
+    """
+
+    def __init__(self, spec, maxsize):
+        self.user = self.ip = self.concurrency = None
+        for part in (spec or '').split():
+            kind, _, value = part.partition('=')
+            if kind in ('user', 'ip'):
+                count, _, seconds = value.partition('/')
+                setattr(self, kind, TokenBuckets(int(count), float(seconds or 1), maxsize))
+            elif kind == 'concurrency':
+                self.concurrency = ConcurrencyLimit(int(value))
+            else:
+                raise ValueError(f"unknown rate limit {part!r}")
+
+
+def get_route_limits(app, name):
+    limits = app.extensions.setdefault('rate_limits', {})
+    route = limits.get(name)
+    if route is None:
+        route = limits.setdefault(name, RouteLimits(
+            app.config.get(f"RATE_LIMIT_{name.upper()}"), app.config["RATE_LIMIT_MAX_KEYS"]
+        ))
+    return route
+
+
+def _too_many(name, reason, retry_after):
+    RATE_LIMITED.inc(name, reason)
+    log.info("rate limited route=%s reason=%s ip=%s", name, reason, request.remote_addr)
+    return jsonify(msg="Too many requests, try again shortly"), 429, {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+def _refund(taken):
+    for buckets, key in taken:
+        buckets.refund(key)
+
+
+def rate_limit(name):
+    """Per-user / per-IP token buckets and a concurrency cap from RATE_LIMIT_<NAME>.
+
+    Goes under @protectRoute when there is one, so the user is known; on
+    open routes (login, register) only the IP and concurrency limits apply.
+    State is per worker process.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            if not current_app.config["RATE_LIMIT_ENABLED"]:
+                return await f(*args, **kwargs)
+            limits = get_route_limits(current_app, name)
+
+            # a request turned away by one limit gives back the tokens it took from the others
+            taken = []
+            user_id = g.get('current_user')
+            ip = request.remote_addr or ''
+            if limits.user is not None and user_id:
+                wait = limits.user.take(str(user_id))
+                if wait:
+                    return _too_many(name, 'user', wait)
+                taken.append((limits.user, str(user_id)))
+            if limits.ip is not None:
+                wait = limits.ip.take(ip)
+                if wait:
+                    _refund(taken)
+                    return _too_many(name, 'ip', wait)
+                taken.append((limits.ip, ip))
+
+            if limits.concurrency is None:
+                return await f(*args, **kwargs)
+            if not limits.concurrency.acquire():
+                _refund(taken)
+                return _too_many(name, 'concurrency', 1)
+            try:
+                return await f(*args, **kwargs)
+            finally:
+                limits.concurrency.release()
+
+        return wrapper
+    return decorator
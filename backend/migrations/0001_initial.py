@@ -0,0 +1,33 @@
+"""users and expense tables as originally created by db.create_all()."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+users = sa.Table(
+    'users', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(30), nullable=False, unique=True),
+    sa.Column('email', sa.String(120), nullable=False, unique=True),
+    sa.Column('password_hash', sa.LargeBinary(60), nullable=False),
+    sa.Column('income', sa.String(50), nullable=False),
+    sa.Column('description', sa.String(200), nullable=False),
+)
+
+expense = sa.Table(
+    'expense', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('title', sa.String(120), nullable=False),
+    sa.Column('amount', sa.Float, nullable=False),
+    sa.Column('category', sa.String(50), nullable=False),
+    sa.Column('timestamp', sa.DateTime),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+)
+
+
+def upgrade(conn):
+    # checkfirst: databases made by the old create_all() already have these
+    metadata.create_all(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    metadata.drop_all(conn, checkfirst=True)
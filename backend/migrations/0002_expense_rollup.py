@@ -0,0 +1,41 @@
+"""Per-user monthly rollup table (see utils/rollup.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('users', metadata, sa.Column('id', sa.Integer, primary_key=True))  # FK target only
+
+expense_rollup = sa.Table(
+    'expense_rollup', metadata,
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), primary_key=True),
+    sa.Column('month', sa.String(7), primary_key=True),
+    sa.Column('category', sa.String(50), primary_key=True),
+    sa.Column('total', sa.Float, nullable=False),
+    sa.Column('count', sa.Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    if sa.inspect(conn).has_table('expense_rollup'):
+        return
+    expense_rollup.create(conn)
+    # backfill from whatever expenses already exist
+    conn.execute(sa.text("""
+        INSERT INTO expense_rollup (user_id, month, category, total, count)
+        SELECT user_id, month, category, SUM(amount), COUNT(*) FROM (
+            SELECT user_id, {month} AS month, category, amount
+            FROM expense WHERE timestamp IS NOT NULL
+        ) AS e GROUP BY user_id, month, category
+        UNION ALL
+        SELECT user_id, month, '', SUM(amount), COUNT(*) FROM (
+            SELECT user_id, {month} AS month, amount
+            FROM expense WHERE timestamp IS NOT NULL
+        ) AS e GROUP BY user_id, month
+    """.format(month=(
+        "to_char(timestamp, 'YYYY-MM')" if conn.dialect.name == 'postgresql'
+        else "strftime('%Y-%m', timestamp)"
+    ))))
+
+
+def downgrade(conn):
+    expense_rollup.drop(conn, checkfirst=True)
@@ -0,0 +1,33 @@
+"""Composite indexes backing every per-user expense query.
+
+(user_id, timestamp) serves the recent / date-range / keyset-paginated reads,
+(user_id, category, timestamp) the category-filtered ones.
+"""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+expense = sa.Table(
+    'expense', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('category', sa.String(50)),
+    sa.Column('timestamp', sa.DateTime),
+    sa.Column('user_id', sa.Integer),
+)
+
+indexes = [
+    sa.Index('ix_expense_user_timestamp', expense.c.user_id, expense.c.timestamp),
+    sa.Index('ix_expense_user_category_timestamp', expense.c.user_id, expense.c.category, expense.c.timestamp),
+]
+
+
+def upgrade(conn):
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('ANALYZE expense')   # give the planner fresh statistics
+
+
+def downgrade(conn):
+    for index in indexes:
+        index.drop(conn, checkfirst=True)
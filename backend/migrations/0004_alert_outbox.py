@@ -0,0 +1,33 @@
+"""Outbox table drained by utils/alert_dispatcher.py."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('users', metadata, sa.Column('id', sa.Integer, primary_key=True))  # FK target only
+
+alert_outbox = sa.Table(
+    'alert_outbox', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+    sa.Column('dedup_key', sa.String(120), nullable=False),
+    sa.Column('recipient', sa.String(120), nullable=False),
+    sa.Column('subject', sa.String(200), nullable=False),
+    sa.Column('body', sa.Text, nullable=False),
+    sa.Column('status', sa.String(10), nullable=False),
+    sa.Column('attempts', sa.Integer, nullable=False),
+    sa.Column('last_error', sa.String(300)),
+    sa.Column('claimed_by', sa.String(32)),
+    sa.Column('created_at', sa.DateTime, nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime, nullable=False),
+    sa.Column('sent_at', sa.DateTime),
+    sa.Index('ix_alert_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    sa.Index('ix_alert_outbox_dedup_created', 'dedup_key', 'created_at'),
+)
+
+
+def upgrade(conn):
+    alert_outbox.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    alert_outbox.drop(conn, checkfirst=True)
@@ -0,0 +1,27 @@
+"""Materialized per-user running balance (see utils/balance.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sa.Table('users', metadata, sa.Column('id', sa.Integer, primary_key=True))  # FK target only
+
+user_balance = sa.Table(
+    'user_balance', metadata,
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), primary_key=True),
+    sa.Column('spent', sa.Float, nullable=False),
+    sa.Column('count', sa.Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    if sa.inspect(conn).has_table('user_balance'):
+        return
+    user_balance.create(conn)
+    conn.execute(sa.text(
+        "INSERT INTO user_balance (user_id, spent, count) "
+        "SELECT user_id, SUM(amount), COUNT(*) FROM expense GROUP BY user_id"
+    ))
+
+
+def downgrade(conn):
+    user_balance.drop(conn, checkfirst=True)
@@ -0,0 +1,60 @@
+"""Full-text index over expense titles and categories (see utils/search.py).
+
+SQLite: a contentless FTS5 table kept in sync by triggers. Its rowid is
+user_id << 32 | expense.id, which keeps each user's entries together so a
+search can stay inside one user's range. PostgreSQL: a GIN index on the same
+tsvector expression the search query uses, so no triggers are needed.
+"""
+import sqlalchemy as sa
+
+SQLITE_TRIGGERS = {
+    'expense_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS expense_fts_ai AFTER INSERT ON expense BEGIN
+            INSERT INTO expense_fts (rowid, title, category)
+            VALUES ((new.user_id << 32) + new.id, new.title, new.category);
+        END""",
+    'expense_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS expense_fts_ad AFTER DELETE ON expense BEGIN
+            INSERT INTO expense_fts (expense_fts, rowid, title, category)
+            VALUES ('delete', (old.user_id << 32) + old.id, old.title, old.category);
+        END""",
+    'expense_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS expense_fts_au AFTER UPDATE OF title, category, user_id ON expense BEGIN
+            INSERT INTO expense_fts (expense_fts, rowid, title, category)
+            VALUES ('delete', (old.user_id << 32) + old.id, old.title, old.category);
+            INSERT INTO expense_fts (rowid, title, category)
+            VALUES ((new.user_id << 32) + new.id, new.title, new.category);
+        END""",
+}
+
+
+def upgrade(conn):
+    if conn.dialect.name == 'sqlite':
+        if not sa.inspect(conn).has_table('expense_fts'):
+            # prefix indexes: "ub"* .. "transp"* read one list instead of
+            # merging every word that starts that way (see utils/search.py)
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE expense_fts USING fts5("
+                "title, category, content='', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO expense_fts (rowid, title, category) "
+                "SELECT (user_id << 32) + id, title, category FROM expense"
+            )
+        for sql in SQLITE_TRIGGERS.values():
+            conn.exec_driver_sql(sql)
+    elif conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_expense_search ON expense "
+            "USING gin (to_tsvector('simple', title || ' ' || category))"
+        )
+
+
+def downgrade(conn):
+    if conn.dialect.name == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS expense_fts")
+    elif conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_expense_search")
@@ -0,0 +1,19 @@
+"""Logged-out tokens, shared by all workers (see utils/token_cache.py)."""
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+revoked_token = sa.Table(
+    'revoked_token', metadata,
+    sa.Column('digest', sa.LargeBinary(32), primary_key=True),
+    sa.Column('expires_at', sa.DateTime, nullable=False),
+    sa.Index('ix_revoked_token_expires_at', 'expires_at'),
+)
+
+
+def upgrade(conn):
+    revoked_token.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    revoked_token.drop(conn, checkfirst=True)
@@ -1,5 +1,5 @@
 import bcrypt
-from app import db
+from utils.extensions import db
 from datetime import datetime
 
 
@@ -10,13 +10,17 @@ class User(db.Model):
     username  = db.Column(db.String(30), nullable=False, unique=True)
     email     = db.Column(db.String(120), nullable=False, unique=True)
     password_hash = db.Column(db.LargeBinary(60), nullable=False) #bcrypt hashes are bytes
-    income      = db.Column(db.String(50), nullable=False, default=0)
+    income      = db.Column(db.String(50), nullable=False, default='0')
     description  = db.Column(db.String(200), nullable=False, default='')
 
     # OPTIONAL: lets you do u.categories and u.expenses
     # categories = db.relationship('Category', backref='owner', lazy=True)
-    expenses   = db.relationship('Expense',  backref='spender', lazy='selectin')
+    # Opt-in only: touching user.expenses without .options(selectinload(User.expenses))
+    # raises instead of silently loading the user's whole history.
+    expenses   = db.relationship('Expense', backref=db.backref('spender', lazy='raise'), lazy='raise')
 
+    # NOTE: these block for the whole bcrypt run. Request handlers go through
+    # utils.hashing.PasswordHasher instead, which runs bcrypt on a thread pool.
     def set_password(self, password: str):
         """Hash a plaintext password and store the binary result."""
         # bcrypt.gensalt() generates a random salt with default cost (12)
@@ -50,6 +54,12 @@ class User(db.Model):
 
 class Expense(db.Model):
     __tablename__ = 'expense'
+    __table_args__ = (
+        # every query is scoped to one user and most sort / range on timestamp
+        # (created by migrations/0003_expense_indexes.py)
+        db.Index('ix_expense_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_expense_user_category_timestamp', 'user_id', 'category', 'timestamp'),
+    )
 
     id          = db.Column(db.Integer, primary_key=True)             # PK
     title       = db.Column(db.String(120),   nullable=False, default="Title")
@@ -70,4 +80,75 @@ class Expense(db.Model):
     # )
 
     # OPTIONAL: lets you do e.category and e.spender
-    # category    = db.relationship('Category', backref='expenses', lazy=True)
\ No newline at end of file
+    # category    = db.relationship('Category', backref='expenses', lazy=True)
+
+
+
+class ExpenseRollup(db.Model):
+    """Per-user, per-month totals kept in step with the expense table.
+
+    One row per (user, month, category) plus a row with category ``''`` holding
+    the whole month, so dashboard totals are a single-row lookup.
+    """
+    __tablename__ = 'expense_rollup'
+
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    month       = db.Column(db.String(7), primary_key=True)           # '2024-07' format
+    category    = db.Column(db.String(50), primary_key=True)          # '' -> all categories
+    total       = db.Column(db.Float, nullable=False, default=0)
+    count       = db.Column(db.Integer, nullable=False, default=0)
+
+
+
+class UserBalance(db.Model):
+    """Running total of a user's expenses, adjusted by deltas on every write.
+
+    Savings are income - spent, so threshold checks never have to sum the
+    expense table (see utils/balance.py).
+    """
+    __tablename__ = 'user_balance'
+
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    spent       = db.Column(db.Float, nullable=False, default=0)
+    count       = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AlertOutbox(db.Model):
+    """Alert e-mails waiting to be sent by utils/alert_dispatcher.py.
+
+    Rows are written in the same transaction as the expense change that
+    triggered them, so an alert is never lost or sent for a rolled-back write.
+    """
+    __tablename__ = 'alert_outbox'
+    __table_args__ = (
+        db.Index('ix_alert_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_alert_outbox_dedup_created', 'dedup_key', 'created_at'),
+    )
+
+    id              = db.Column(db.Integer, primary_key=True)
+    user_id         = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    dedup_key       = db.Column(db.String(120), nullable=False)   # e.g. 'savings:42'
+    recipient       = db.Column(db.String(120), nullable=False)
+    subject         = db.Column(db.String(200), nullable=False)
+    body            = db.Column(db.Text, nullable=False)
+    status          = db.Column(db.String(10), nullable=False, default='pending')  # pending / sending / sent / failed
+    attempts        = db.Column(db.Integer, nullable=False, default=0)
+    last_error      = db.Column(db.String(300))
+    claimed_by      = db.Column(db.String(32))
+    created_at      = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at         = db.Column(db.DateTime)
+
+
+class RevokedToken(db.Model):
+    """Logged-out access tokens, shared by every worker until they expire (see utils/token_cache.py).
+
+    Lives on DATABASE_URL; rows past expires_at are pruned on the next logout.
+    """
+    __tablename__ = 'revoked_token'
+    __table_args__ = (
+        db.Index('ix_revoked_token_expires_at', 'expires_at'),
+    )
+
+    digest          = db.Column(db.LargeBinary(32), primary_key=True)   # sha256 of the raw token
+    expires_at      = db.Column(db.DateTime, nullable=False)
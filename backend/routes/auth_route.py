@@ -2,17 +2,20 @@
 from flask import Blueprint, request
 from controllers.auth_controller import register_user, login_user, check_auth, logout_user, updateProfile
 from middlewares.auth_middleware import protectRoute
+from middlewares.rate_limit import rate_limit
 # if __init__.py not used to import any file, then make sure that project root is on sys.path
 
 auth_bp = Blueprint('auth', __name__) # Blueprint is a class and auth_bp is an object/ instance of it.
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 async def register():
     data = request.get_json() or {}
     return await register_user(data) # without using await, some coroutine error came as register_user is an async function
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 async def login():
     data = request.get_json() or {}
     return await login_user(data)
@@ -1,6 +1,8 @@
 from flask import Blueprint, request
-from controllers.expense_controller import create_expense, read_expense, edit_expense, delete_expense, recent_6_expense, recentThreeMonthExpense, latest_month_total
+from controllers.expense_controller import create_expense, read_expense, search_expenses, edit_expense, delete_expense, recent_6_expense, recentThreeMonthExpense, latest_month_total, import_expenses, export_expenses, expense_analytics, expense_series, batch_update_expenses, batch_delete_expenses
 from middlewares.auth_middleware import protectRoute
+from middlewares.rate_limit import rate_limit
+from utils.response_cache import cached_response
 
 expense_bp = Blueprint('expense', __name__)
 
@@ -8,10 +10,22 @@ expense_bp = Blueprint('expense', __name__)
 @protectRoute
 async def register_expense():
     data = request.get_json() or {}
-    print("Hola Amigos")
     return await create_expense(data)
 
 
+@expense_bp.route('/import', methods=['POST'])
+@protectRoute
+async def bulk_import():
+    # body is read incrementally - never call request.get_data() here
+    return await import_expenses(request.stream, request.args.get('format'), request.content_type)
+
+
+@expense_bp.route('/export', methods=['GET'])
+@protectRoute
+async def export_exp():
+    return await export_expenses(request.args, request.headers.get('Accept-Encoding'))
+
+
 @expense_bp.route('/update', methods=['PUT'])
 @protectRoute
 async def update_expense():
@@ -19,10 +33,45 @@ async def update_expense():
     return await edit_expense(data)
 
 
+@expense_bp.route('/batch/update', methods=['PUT'])
+@protectRoute
+async def batch_update():
+    data = request.get_json() or {}
+    return await batch_update_expenses(data)
+
+
+@expense_bp.route('/batch/delete', methods=['DELETE'])
+@protectRoute
+async def batch_delete():
+    data = request.get_json() or {}
+    return await batch_delete_expenses(data)
+
+
 @expense_bp.route('/read', methods=['GET'])
 @protectRoute
+@rate_limit('read')
 async def read_exp():
-    return await read_expense()
+    return await read_expense(request.args)
+
+
+@expense_bp.route('/search', methods=['GET'])
+@protectRoute
+async def search_exp():
+    return await search_expenses(request.args)
+
+
+@expense_bp.route('/analytics', methods=['GET'])
+@protectRoute
+@cached_response('analytics')
+async def analytics():
+    return await expense_analytics(request.args)
+
+
+@expense_bp.route('/series', methods=['GET'])
+@protectRoute
+@cached_response('series')
+async def series():
+    return await expense_series(request.args)
 
 
 @expense_bp.route('/delete', methods=['DELETE'])
@@ -33,15 +82,18 @@ async def del_expense():
 
 @expense_bp.route('/recent', methods=['GET'])
 @protectRoute
+@cached_response('recent')
 async def recent_six_expenses():
     return await recent_6_expense()
 
 @expense_bp.route('/recentmonthsExpense', methods=['GET'])
 @protectRoute
+@cached_response('recentmonthsExpense')
 async def recent_three_month_expenses():
     return await recentThreeMonthExpense()
 
 @expense_bp.route('/latestMonthTotal', methods=['GET'])
 @protectRoute
+@cached_response('latestMonthTotal')
 async def total_expense():
     return await latest_month_total()
\ No newline at end of file
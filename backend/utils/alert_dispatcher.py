@@ -0,0 +1,220 @@
+# utils/alert_dispatcher.py
+"""
+Background delivery of the alert e-mails queued in alert_outbox.
+
+A single dispatcher thread per process claims pending rows in batches, sends
+them over one SMTP connection that is kept open between batches, and retries
+failures with exponential backoff until ALERT_MAX_ATTEMPTS. A claimed row is
+never handed out twice, so a worker dying mid-batch leaves it in 'sending'
+rather than risking a duplicate e-mail. With SHARD_URLS set, each shard has
+its own outbox and every pass drains them all.
+"""
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from functools import partial
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from models import AlertOutbox
+from utils.extensions import create_engine_from_config, shard_urls, shards
+from utils.metrics import observe_smtp
+
+log = logging.getLogger(__name__)
+
+# refused by the server for this message only; anything else means the connection is unusable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class AlertDispatcher:
+
+    def __init__(self, config, session_factory=None):
+        self.config = config
+        # one per outbox: every shard's, unless a factory is given
+        self.session_factories = [session_factory] if session_factory else [
+            partial(shards.session, index) for index in range(shards.count)
+        ]
+        self._own_engine = session_factory is None
+        self.batch_size = config["ALERT_BATCH_SIZE"]
+        self.poll_interval = config["ALERT_POLL_INTERVAL"]
+        self.max_attempts = config["ALERT_MAX_ATTEMPTS"]
+        self.retry_backoff = config["ALERT_RETRY_BACKOFF"]
+        self.smtp_idle_timeout = config["SMTP_IDLE_TIMEOUT"]
+
+        self._smtp = None
+        self._smtp_last_used = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # ------------------------- SMTP -------------------------
+    def _connect(self):
+        cfg = self.config
+        smtp = smtplib.SMTP(cfg["SMTP_HOST"], cfg["SMTP_PORT"], timeout=cfg["SMTP_TIMEOUT"])
+        if cfg["SMTP_STARTTLS"]:
+            smtp.starttls()
+        if cfg["SMTP_USER"] and cfg["SMTP_PASS"]:
+            smtp.login(cfg["SMTP_USER"], cfg["SMTP_PASS"])
+        return smtp
+
+    def _send(self, msg):
+        """Send over the pooled connection, reconnecting once if the server dropped it."""
+        for retry in (False, True):
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.send_message(msg)
+                self._smtp_last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if retry:
+                    raise
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._smtp_last_used > self.smtp_idle_timeout:
+            self.close()
+
+    # ------------------------- OUTBOX -------------------------
+    async def _claim(self, session, now):
+        """Atomically mark a batch of due rows as ours, so several workers never send the same row."""
+        token = uuid.uuid4().hex
+        due = (
+            select(AlertOutbox.id)
+            .where(AlertOutbox.status == 'pending', AlertOutbox.next_attempt_at <= now)
+            .order_by(AlertOutbox.id)
+            .limit(self.batch_size)
+        )
+        await session.execute(
+            update(AlertOutbox)
+            .where(AlertOutbox.id.in_(due.scalar_subquery()), AlertOutbox.status == 'pending')
+            .values(status='sending', claimed_by=token)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+        result = await session.execute(
+            select(AlertOutbox).where(AlertOutbox.status == 'sending', AlertOutbox.claimed_by == token)
+        )
+        return result.scalars().all()
+
+    async def drain_once(self):
+        """Send one batch from each outbox. Returns the number of rows processed (sent or failed)."""
+        processed = 0
+        for session_factory in self.session_factories:
+            processed += await self._drain(session_factory)
+        if not processed:
+            self._close_if_idle()
+        return processed
+
+    async def _drain(self, session_factory):
+        now = datetime.utcnow()
+        async with session_factory() as session:
+            alerts = await self._claim(session, now)
+            if not alerts:
+                return 0
+
+            connection_error = None
+            for alert in alerts:
+                msg = MIMEText(alert.body)
+                msg["Subject"] = alert.subject
+                msg["From"]    = self.config["SMTP_USER"]
+                msg["To"]      = alert.recipient
+                alert.attempts += 1
+                started = time.perf_counter()
+                try:
+                    if connection_error:
+                        # server unreachable: don't wait out the timeout for every row
+                        raise connection_error
+                    self._send(msg)
+                except MESSAGE_ERRORS as e:
+                    observe_smtp(time.perf_counter() - started, 'rejected')
+                    self._retry_later(alert, e, now)
+                except (smtplib.SMTPException, OSError) as e:
+                    if connection_error is None:
+                        observe_smtp(time.perf_counter() - started, 'connection_error')
+                    self.close()
+                    connection_error = e
+                    self._retry_later(alert, e, now)
+                else:
+                    observe_smtp(time.perf_counter() - started, 'sent')
+                    alert.status = 'sent'
+                    alert.sent_at = datetime.utcnow()
+
+            await session.commit()
+            return len(alerts)
+
+    def _retry_later(self, alert, error, now):
+        alert.last_error = str(error)[:300]
+        if alert.attempts >= self.max_attempts:
+            alert.status = 'failed'
+            log.warning("alert %s failed permanently: %s", alert.id, error)
+        else:
+            alert.status = 'pending'
+            alert.next_attempt_at = now + timedelta(
+                seconds=self.retry_backoff * 2 ** (alert.attempts - 1)
+            )
+
+    # ------------------------- THREAD -------------------------
+    async def run(self):
+        while not self._stop.is_set():
+            try:
+                processed = await self.drain_once()
+            except Exception:
+                log.exception("alert dispatcher batch failed")
+                processed = 0
+            # a full batch means there is probably more waiting
+            if processed < self.batch_size:
+                await asyncio.to_thread(self._stop.wait, self.poll_interval)
+        self.close()
+
+    async def _run_in_thread(self):
+        if not self._own_engine:
+            return await self.run()
+        # this thread runs its own event loop, and pooled connections must not
+        # move between loops - so it gets small engines of its own, one per shard
+        engines = [
+            create_engine_from_config({**self.config, "SQLALCHEMY_DATABASE_URI": url, "DB_POOL_SIZE": 1})
+            for url in shard_urls(self.config)
+        ]
+        self.session_factories = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) for engine in engines
+        ]
+        try:
+            await self.run()
+        finally:
+            for engine in engines:
+                await engine.dispose()
+
+    @property
+    def started(self):
+        # a plain read: the lock is only taken by the request that actually starts it
+        return self._thread is not None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=asyncio.run, args=(self._run_in_thread(),), name="alert-dispatcher", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
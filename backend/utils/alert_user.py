@@ -1,37 +1,51 @@
 # utils/threshold.py
-import smtplib
-from email.mime.text import MIMEText
+from datetime import datetime, timedelta
 from flask import current_app
-from models import User
+from sqlalchemy import select
+from models import AlertOutbox
+from utils.balance import load_savings
+from utils.metrics import ALERTS_QUEUED
 
 async def check_and_notify(user_id, session):
-    """Calculate this user’s savings; if they’ve crossed the threshold, send them an email."""
-    # 1) load user and their expenses
-    user = await session.get(User, user_id)
-    total_exp = sum(e.amount for e in user.expenses or [])
-    income    = float(getattr(user, "income", 0))
-    savings   = income - total_exp
+    """Calculate this user’s savings; if they’ve crossed the threshold, queue an alert e-mail.
+
+    Must be called before session.commit(): the alert goes into alert_outbox in
+    the same transaction as the expense change, and utils/alert_dispatcher.py
+    delivers it later, off the request path. Reads the stored user_balance, so
+    the RollupDelta for the change must already be flushed.
+    """
+    # 1) load user and their running balance
+    user, savings = await load_savings(session, user_id)
 
     threshold = current_app.config["SAVINGS_THRESHOLD"]
-    if savings < threshold:
-        body = (
-            f"Hi {user.username},\n\n"
-            f"You’ve just crossed your savings threshold of "
-            f"${threshold:.2f} with ${savings:.2f} in the bank!\n"
-            "Expend money wisely !!!!\n"
-        )
-        msg = MIMEText(body)
-        msg["Subject"] = " 🚨 Savings Alert"
-        msg["From"]    = current_app.config["SMTP_USER"]
-        msg["To"]      = user.email
+    if savings >= threshold:
+        return
+
+    # 2) at most one alert per user per ALERT_DEDUP_WINDOW
+    now = datetime.utcnow()
+    dedup_key = f"savings:{user.id}"
+    window_start = now - timedelta(seconds=current_app.config["ALERT_DEDUP_WINDOW"])
+    recent = await session.execute(
+        select(AlertOutbox.id)
+        .where(AlertOutbox.dedup_key == dedup_key, AlertOutbox.created_at >= window_start)
+        .limit(1)
+    )
+    if recent.first():
+        return
 
-        with smtplib.SMTP(
-            current_app.config["SMTP_HOST"],
-            current_app.config["SMTP_PORT"]
-        ) as smtp:
-            smtp.starttls()
-            smtp.login(
-                current_app.config["SMTP_USER"],
-                current_app.config["SMTP_PASS"]
-            )
-            smtp.send_message(msg)
+    body = (
+        f"Hi {user.username},\n\n"
+        f"You’ve just crossed your savings threshold of "
+        f"${threshold:.2f} with ${savings:.2f} in the bank!\n"
+        "Expend money wisely !!!!\n"
+    )
+    session.add(AlertOutbox(
+        user_id=user.id,
+        dedup_key=dedup_key,
+        recipient=user.email,
+        subject=" 🚨 Savings Alert",
+        body=body,
+        created_at=now,
+        next_attempt_at=now,
+    ))
+    ALERTS_QUEUED.inc()
@@ -0,0 +1,86 @@
+# utils/balance.py
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Expense, User, UserBalance
+
+
+async def adjust_balances(session, deltas):
+    """Apply {user_id: (amount, count)} deltas to user_balance; the caller commits."""
+    rows = [
+        {"user_id": user_id, "spent": amount, "count": count}
+        for user_id, (amount, count) in deltas.items()
+        if amount or count
+    ]
+    if not rows:
+        return
+
+    dialect = session.get_bind().dialect.name
+    stmt = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(UserBalance)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'spent': UserBalance.spent + stmt.excluded.spent,
+            'count': UserBalance.count + stmt.excluded.count,
+        },
+    )
+    await session.execute(stmt, rows)
+
+
+async def load_savings(session, user_id):
+    """(user row, savings) from the stored balance - O(1) whatever the history length.
+
+    Only the columns needed are selected, so User.expenses is never loaded.
+    """
+    result = await session.execute(
+        select(User.id, User.username, User.email, User.income,
+               func.coalesce(UserBalance.spent, 0.0).label("spent"))
+        .outerjoin(UserBalance, UserBalance.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    user = result.one()
+    return user, float(user.income or 0) - user.spent
+
+
+def _expected_balances():
+    return (
+        select(Expense.user_id, func.sum(Expense.amount).label("spent"), func.count().label("count"))
+        .group_by(Expense.user_id)
+    )
+
+
+async def find_drift(session, tolerance=1e-6):
+    """Users whose stored balance disagrees with their expense rows: [(user_id, stored, actual)]."""
+    expected = _expected_balances().subquery()
+    stored = select(UserBalance.user_id, UserBalance.spent, UserBalance.count).subquery()
+
+    # full outer join, spelled as two left joins so SQLite can run it too
+    missing_or_wrong = (
+        select(expected.c.user_id, stored.c.spent, stored.c.count, expected.c.spent, expected.c.count)
+        .outerjoin(stored, stored.c.user_id == expected.c.user_id)
+        .where(
+            (stored.c.user_id.is_(None))
+            | (func.abs(stored.c.spent - expected.c.spent) > tolerance)
+            | (stored.c.count != expected.c.count)
+        )
+    )
+    orphaned = (
+        select(stored.c.user_id, stored.c.spent, stored.c.count, None, None)
+        .outerjoin(expected, expected.c.user_id == stored.c.user_id)
+        .where(expected.c.user_id.is_(None), (stored.c.spent != 0) | (stored.c.count != 0))
+    )
+    drift = []
+    for query in (missing_or_wrong, orphaned):
+        for user_id, spent, count, actual_spent, actual_count in await session.execute(query):
+            drift.append((user_id, (spent or 0.0, count or 0), (actual_spent or 0.0, actual_count or 0)))
+    return drift
+
+
+async def rebuild_balances(session, user_ids=None):
+    """Recompute user_balance from the expense table in bulk (all users or the given ones)."""
+    clear = delete(UserBalance)
+    source = _expected_balances()
+    if user_ids is not None:
+        clear = clear.where(UserBalance.user_id.in_(user_ids))
+        source = source.where(Expense.user_id.in_(user_ids))
+    await session.execute(clear)
+    await session.execute(insert(UserBalance).from_select(['user_id', 'spent', 'count'], source))
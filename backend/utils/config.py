@@ -1,14 +1,35 @@
 from datetime import timedelta
-from dotenv import load_dotenv
-load_dotenv()
 import os
 
+# Values are read from the environment when this module is first imported;
+# create_app() loads .env (python-dotenv) before that happens.
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'ecommerce.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Engine / pool (utils/extensions.py). DATABASE_URL may be sqlite:/// or postgresql://
+    DB_POOL_SIZE     = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW  = int(os.getenv("DB_MAX_OVERFLOW", 0))     # SQLite has one writer; extra connections only add lock contention
+    DB_POOL_RECYCLE  = int(os.getenv("DB_POOL_RECYCLE", 1800))   # seconds
+    DB_POOL_TIMEOUT  = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+    # Expense storage split by user over several databases (utils/shards.py):
+    # comma-separated URLs, empty = everything in DATABASE_URL. Only append:
+    # a new URL at the end takes ~1/N of the users, then run
+    # `flask shards rebalance` (with writes stopped) to move their rows
+    SHARD_URLS       = os.getenv("SHARD_URLS", "")
+    # Apply pending migrations when the app is created. Off by default: run
+    # `flask db upgrade` once per deploy instead of in every worker that boots
+    AUTO_MIGRATE     = os.getenv("AUTO_MIGRATE", "0") == "1"
+    # Applied to every new SQLite connection; set one to "" to leave SQLite's default
+    SQLITE_JOURNAL_MODE    = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS     = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")
+    SQLITE_MMAP_SIZE       = os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     JWT_TOKEN_LOCATION  = ['headers', 'cookies']
     JWT_ACCESS_COOKIE_NAME = 'access_token'
@@ -16,11 +37,78 @@ class Config:
     SMTP_PORT        = int(os.getenv("SMTP_PORT", 587))
     SMTP_USER        = os.getenv("SMTP_USER", "")
     SMTP_PASS        = os.getenv("SMTP_PASS", "")
+    SMTP_STARTTLS    = os.getenv("SMTP_STARTTLS", "1") == "1"
+    SMTP_TIMEOUT     = float(os.getenv("SMTP_TIMEOUT", 10))
+    SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))   # close the pooled connection after this
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=2) 
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))   # verified tokens kept by protectRoute, 0 = off
+    TOKEN_REVOCATION_RECHECK = float(os.getenv("TOKEN_REVOCATION_RECHECK", 5))   # secs a cached token skips the revoked_token lookup
+    LOG_LEVEL        = os.getenv("LOG_LEVEL", "INFO")
+    METRICS_ENABLED  = os.getenv("METRICS_ENABLED", "1") == "1"     # /metrics + request / SQL timing
+
+    # Per-request sampling profiles (utils/profiler.py); nothing is installed unless enabled
+    PROFILE_ENABLED     = os.getenv("PROFILE_ENABLED", "0") == "1"
+    PROFILE_TOKEN       = os.getenv("PROFILE_TOKEN", "")                # `X-Profile: <token>` profiles that request
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))    # share of all requests, 0..1
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))    # below sys.getswitchinterval() buys little
+    PROFILE_DIR         = os.getenv("PROFILE_DIR", os.path.join(basedir, 'profiles'))
+    PROFILE_MAX_FILES   = int(os.getenv("PROFILE_MAX_FILES", 200))      # oldest deleted beyond this
+
+    # Per-user cache of the dashboard reads (utils/response_cache.py)
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")   # memory | sqlite (multi-worker) | none
+    RESPONSE_CACHE_SIZE    = int(os.getenv("RESPONSE_CACHE_SIZE", 10000))    # responses kept
+    RESPONSE_CACHE_TTL     = int(os.getenv("RESPONSE_CACHE_TTL", 300))       # seconds; writes invalidate sooner
+    RESPONSE_CACHE_PATH    = os.getenv("RESPONSE_CACHE_PATH", os.path.join(basedir, 'response_cache.db'))
+
+    # Serving (utils/event_loop.py): async views share one event loop per worker
+    PERSISTENT_EVENT_LOOP = os.getenv("PERSISTENT_EVENT_LOOP", "1") == "1"   # 0 = plain asgiref WsgiToAsgi
+    SERVER_THREADS        = int(os.getenv("SERVER_THREADS", 32))             # requests in flight per worker
+
+    # Password hashing (utils/hashing.py)
+    BCRYPT_ROUNDS      = int(os.getenv("BCRYPT_ROUNDS", 12))      # existing hashes are upgraded on login
+    BCRYPT_MAX_WORKERS = int(os.getenv("BCRYPT_MAX_WORKERS", 4))  # hashes running at once, 0 = inline
+    BCRYPT_MAX_QUEUE   = int(os.getenv("BCRYPT_MAX_QUEUE", 64))   # waiting beyond that -> 503
+
+    # Rate / concurrency limits (middlewares/rate_limit.py), per worker process.
+    # "user=N/S ip=N/S concurrency=N": bursts of N, then N per S seconds, per
+    # user / client IP; at most N requests of the route in flight
+    RATE_LIMIT_ENABLED  = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))     # buckets kept per limit (LRU)
+    RATE_LIMIT_LOGIN    = os.getenv("RATE_LIMIT_LOGIN", "ip=10/60 concurrency=16")    # bcrypt per attempt
+    RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "ip=5/60 concurrency=8")
+    RATE_LIMIT_READ     = os.getenv("RATE_LIMIT_READ", "user=20/1 ip=60/1 concurrency=32")
 
     # Savings threshold (numeric)
     SAVINGS_THRESHOLD = float(os.getenv("SAVINGS_THRESHOLD", 5000.0))
 
+    # Bulk import (/api/expense/import)
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))   # rows per transaction
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 100))    # per-row errors reported back
+
+    # Group commit for POST /api/expense/create (utils/group_commit.py): creates
+    # arriving together share one transaction. Needs PERSISTENT_EVENT_LOOP=1
+    GROUP_COMMIT_ENABLED      = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+    GROUP_COMMIT_MAX_ROWS     = int(os.getenv("GROUP_COMMIT_MAX_ROWS", 100))       # rows per transaction
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", 2))   # wait for company at most this long
+
+    # Batch update / delete (/api/expense/batch/...)
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))       # ids per request
+
+    # Time series (/api/expense/series)
+    SERIES_DEFAULT_DAYS = int(os.getenv("SERIES_DEFAULT_DAYS", 90))    # range when ?from is missing
+    SERIES_MAX_BUCKETS  = int(os.getenv("SERIES_MAX_BUCKETS", 1000))   # points per response
+
+    # Streaming export (/api/expense/export)
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 1000))   # rows fetched / written per chunk
+
+    # Alert outbox (utils/alert_dispatcher.py)
+    ALERT_DISPATCHER_ENABLED = os.getenv("ALERT_DISPATCHER_ENABLED", "1") == "1"
+    ALERT_DEDUP_WINDOW  = int(os.getenv("ALERT_DEDUP_WINDOW", 3600))     # seconds between two alerts to a user
+    ALERT_BATCH_SIZE    = int(os.getenv("ALERT_BATCH_SIZE", 50))
+    ALERT_POLL_INTERVAL = float(os.getenv("ALERT_POLL_INTERVAL", 2.0))
+    ALERT_MAX_ATTEMPTS  = int(os.getenv("ALERT_MAX_ATTEMPTS", 5))
+    ALERT_RETRY_BACKOFF = float(os.getenv("ALERT_RETRY_BACKOFF", 30))   # seconds, doubled per attempt
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
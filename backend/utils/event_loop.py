@@ -0,0 +1,153 @@
+# utils/event_loop.py
+"""
+One long-lived event loop per worker for the async views.
+
+The stock setup (asgiref's WsgiToAsgi) runs every request through a
+thread-sensitive sync_to_async, so all requests of a worker queue up on a
+single thread, and outside uvicorn Flask spins up a fresh loop per coroutine.
+
+PersistentLoopASGI instead:
+  * runs the WSGI side of each request on a bounded thread pool, so requests
+    really overlap;
+  * runs every async view on the server's own event loop (the loop uvicorn is
+    already running), with the request's contextvars copied over - so the
+    aiosqlite/asyncpg connections in the engine pool stay bound to one loop
+    and get reused instead of being rebuilt.
+
+Flask's request machinery is synchronous, so a request still hops to a pool
+thread and back; what goes away is the per-request loop and the single-thread
+bottleneck. Turn it off with PERSISTENT_EVENT_LOOP=0.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from asgiref.wsgi import WsgiToAsgiInstance
+
+class PersistentLoop:
+    """The loop async views run on: the server's loop once attached, else a private thread."""
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop):
+        with self._lock:
+            if self.loop is None:
+                self.loop = loop
+
+    def get_loop(self):
+        if self.loop is None:
+            # not under an ASGI server (flask run, test client, CLI): start our own
+            with self._lock:
+                if self.loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=loop.run_forever, name='event-loop', daemon=True
+                    )
+                    self._thread.start()
+                    self.loop = loop
+        return self.loop
+
+    def run(self, coro, context=None):
+        """Run a coroutine on the loop from a worker thread and wait for its result."""
+        loop = self.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("PersistentLoop.run() called from the loop's own thread")
+
+        done = asyncio.run_coroutine_threadsafe(_in_context(coro, context), loop)
+        return done.result()
+
+    def async_to_sync(self, func):
+        """Drop-in for Flask.async_to_sync: the view coroutine runs on the persistent loop."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # flask.g / request live in contextvars; hand the view a copy of ours
+            return self.run(func(*args, **kwargs), contextvars.copy_context())
+
+        return wrapper
+
+    def stop(self):
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(5)
+
+
+async def _in_context(coro, context):
+    if context is None:
+        return await coro
+    # the view's Task runs inside the caller's (copied) contextvars
+    return await asyncio.get_running_loop().create_task(coro, context=context)
+
+
+class _Instance(WsgiToAsgiInstance):
+
+    def __init__(self, wsgi_application, executor, loop, **kwargs):
+        super().__init__(wsgi_application, **kwargs)
+        self.executor = executor
+        self.loop = loop
+
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    raise ValueError("WSGI wrapper received a non-HTTP-request message")
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+            self.sync_send = functools.partial(self._send_from_thread, send)
+            await self.loop.run_in_executor(self.executor, self._run_wsgi_app, body)
+
+    def _send_from_thread(self, send, message):
+        asyncio.run_coroutine_threadsafe(send(message), self.loop).result()
+
+    # the undecorated body of WsgiToAsgiInstance.run_wsgi_app (it is wrapped in a
+    # thread-sensitive sync_to_async upstream, which is exactly what we avoid)
+    _run_wsgi_app = WsgiToAsgiInstance.run_wsgi_app.__wrapped__
+
+
+class PersistentLoopASGI:
+    """ASGI entry point for uvicorn: `uvicorn app:asgi_app`."""
+
+    def __init__(self, wsgi_application, persistent_loop, max_threads=32):
+        self.wsgi_application = wsgi_application
+        self.persistent_loop = persistent_loop
+        self.executor = ThreadPoolExecutor(max_threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        self.persistent_loop.attach(loop)
+
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError("WSGI wrapper received a non-HTTP scope")
+        await _Instance(self.wsgi_application, self.executor, loop)(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def get_persistent_loop(app):
+    """The app's PersistentLoop, or None when PERSISTENT_EVENT_LOOP is off."""
+    return app.extensions.get('persistent_loop')
@@ -1,15 +1,283 @@
 
 # extensions.py
+"""
+The one place database engines are built, plus the Flask extension objects.
+
+Everything (requests, migrations, CLI commands, the alert dispatcher) talks to
+the database through `engine` / `async_session` below, configured from the
+DB_* and SQLITE_* settings in app.config (create_app() hands them over). The
+URL in DATABASE_URL picks the driver: sqlite:/// runs on aiosqlite,
+postgresql:// on asyncpg (install it with `pipenv install asyncpg`; nothing
+else changes).
+
+Nothing is built at import time: the engine comes into existence on first use,
+so importing models / controllers (tests, CLI commands, a worker booting)
+never pays for it.
+
+Expense data can be split over several databases (SHARD_URLS): `shards` maps a
+user_id to the one holding that user's expenses, rollups, balance and alerts,
+and `shard_session(user_id)` opens a session there. Logins and profiles
+(the users table) always stay in DATABASE_URL. See utils/shards.py.
+"""
+import threading
+
+from flask_jwt_extended import JWTManager
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from utils.config import Config
 
-# If you plan to use async with SQLite, use the aiosqlite dialect:
-DATABASE_URL = Config.SQLALCHEMY_DATABASE_URI.replace(
-    "sqlite:///", "sqlite+aiosqlite:///"
-)
+# Only used as the declarative base for models.py - it is deliberately not bound to
+# the app, so Flask-SQLAlchemy never builds a second (sync) engine.
+db = SQLAlchemy()
+# Bound in create_app() with jwt.init_app(app); that registers the machinery that
+# creates, verifies and enforces JWTs.
+jwt = JWTManager()
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgres': 'postgresql+asyncpg',      # Heroku-style URLs
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://...
+
+    URLs that already name a driver are left alone.
+    """
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url
+
+
+def _sqlite_pragmas(settings):
+    pragmas = [
+        ('journal_mode', settings.get('SQLITE_JOURNAL_MODE')),      # WAL: readers never block the writer
+        ('synchronous', settings.get('SQLITE_SYNCHRONOUS')),        # NORMAL is durable enough under WAL
+        ('busy_timeout', settings.get('SQLITE_BUSY_TIMEOUT_MS')),   # wait for the lock instead of failing
+        ('mmap_size', settings.get('SQLITE_MMAP_SIZE')),
+    ]
+    return [(name, value) for name, value in pragmas if value not in (None, '')]
+
+
+def create_engine_from_config(settings):
+    """Build the async engine from a config mapping (app.config or config_dict(Config))."""
+    url = async_database_url(settings['SQLALCHEMY_DATABASE_URI'])
+    options = {"future": True}
+
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    if not in_memory:
+        options.update(
+            pool_size=settings['DB_POOL_SIZE'],
+            max_overflow=settings['DB_MAX_OVERFLOW'],
+            pool_recycle=settings['DB_POOL_RECYCLE'],
+            pool_timeout=settings['DB_POOL_TIMEOUT'],
+            pool_pre_ping=settings['DB_POOL_PRE_PING'],
+        )
+
+    engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == 'sqlite':
+        pragmas = _sqlite_pragmas(settings)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                if name == 'journal_mode':
+                    # WAL is stored in the file; switching needs an exclusive lock,
+                    # so only ask for it when the database isn't in that mode yet
+                    cursor.execute("PRAGMA journal_mode")
+                    if cursor.fetchone()[0].lower() == str(value).lower():
+                        continue
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
+def config_dict(config_class):
+    return {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+
+class LazyEngine:
+    """Stands in for the app's AsyncEngine and builds it on first attribute access.
+
+    create_app() calls configure(app.config); code running without an app
+    (scripts, the alert dispatcher in a CLI command) falls back to the
+    environment via utils/config.Config.
+    """
+
+    def __init__(self):
+        self._engine = None
+        self._settings = None
+        self._on_create = []
+        self._lock = threading.Lock()
+
+    def configure(self, settings):
+        if self._engine is not None:
+            if make_url(settings['SQLALCHEMY_DATABASE_URI']) != make_url(self._settings['SQLALCHEMY_DATABASE_URI']):
+                raise RuntimeError("the engine is already in use with another database")
+            return
+        self._settings = settings
+
+    def on_create(self, callback):
+        """Run callback(engine) once the engine exists (right away if it already does)."""
+        with self._lock:
+            if self._engine is None:
+                self._on_create.append(callback)
+                return
+        callback(self._engine)
+
+    def get(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    if self._settings is None:
+                        from utils.config import Config
+                        self._settings = config_dict(Config)
+                    built = create_engine_from_config(self._settings)
+                    for callback in self._on_create:
+                        callback(built)
+                    self._on_create = []
+                    self._engine = built
+        return self._engine
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+engine = LazyEngine()
+_session_factory = None
+
+
+def async_session(**kw):
+    """AsyncSession factory bound to `engine` (a sessionmaker, built on first call)."""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(engine.get(), class_=AsyncSession, expire_on_commit=False)
+    return _session_factory(**kw)
+
+
+# ------------------------- SHARDS -------------------------
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): key -> 0..buckets-1.
+
+    Going from N to N+1 buckets moves only the keys that land in the new one,
+    about 1/(N+1) of them, so adding a shard at the end of SHARD_URLS leaves
+    most users where they are.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_urls(settings):
+    """The shard databases in SHARD_URLS order; just DATABASE_URL when none are set."""
+    urls = [u.strip() for u in (settings.get('SHARD_URLS') or '').split(',') if u.strip()]
+    return urls or [settings['SQLALCHEMY_DATABASE_URI']]
+
+
+class ShardRouter:
+    """Which database holds a user's expenses, and one engine + pool per database.
+
+    Shard i is SHARD_URLS[i]; a user lives on shard jump_hash(user_id, N). A
+    shard whose URL is DATABASE_URL shares `engine` instead of opening a
+    second pool on the same file. Like LazyEngine, nothing is built before it
+    is used, and an unconfigured router falls back to utils/config.Config.
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self._settings = None
+        self._urls = None
+        self._on_main = frozenset()
+        self._engines = {}
+        self._factories = {}
+        self._on_create = []
+        self._lock = threading.Lock()
+
+    def configure(self, settings):
+        urls = shard_urls(settings)
+        if self._engines and [make_url(u) for u in urls] != [make_url(u) for u in self._urls]:
+            raise RuntimeError("the shards are already in use with other databases")
+        main_url = make_url(settings['SQLALCHEMY_DATABASE_URI'])
+        self._on_main = frozenset(i for i, url in enumerate(urls) if make_url(url) == main_url)
+        self._settings, self._urls = settings, urls
+
+    def on_create(self, callback):
+        """Run callback(engine) for every engine as it is built, the main one included."""
+        self._on_create.append(callback)
+        self.main.on_create(callback)
+        for shard in list(self._engines.values()):
+            shard.on_create(callback)
+
+    def _configured(self):
+        if self._urls is None:
+            from utils.config import Config
+            self.configure(config_dict(Config))
+
+    @property
+    def settings(self):
+        self._configured()
+        return self._settings
+
+    @property
+    def urls(self):
+        self._configured()
+        return self._urls
+
+    @property
+    def count(self):
+        return len(self.urls)
+
+    def shard_of(self, user_id):
+        count = self.count
+        return jump_hash(int(user_id), count) if count > 1 else 0
+
+    def is_main(self, index):
+        self._configured()
+        return index in self._on_main
+
+    def engine(self, index):
+        """The LazyEngine for shard `index`."""
+        if self.is_main(index):
+            return self.main
+        shard = self._engines.get(index)
+        if shard is None:
+            with self._lock:
+                shard = self._engines.get(index)
+                if shard is None:
+                    shard = LazyEngine()
+                    shard.configure({**self._settings, 'SQLALCHEMY_DATABASE_URI': self.urls[index]})
+                    for callback in self._on_create:
+                        shard.on_create(callback)
+                    self._engines[index] = shard
+        return shard
+
+    def databases(self):
+        """Every database the app uses: the main one, then each shard that is not it."""
+        return [self.main] + [self.engine(i) for i in range(self.count) if not self.is_main(i)]
+
+    def session(self, index, **kw):
+        factory = self._factories.get(index)
+        if factory is None:
+            factory = self._factories[index] = sessionmaker(
+                self.engine(index).get(), class_=AsyncSession, expire_on_commit=False
+            )
+        return factory(**kw)
+
+
+shards = ShardRouter(engine)
+
 
-engine = create_async_engine(DATABASE_URL, future=True)
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
\ No newline at end of file
+def shard_session(user_id, **kw):
+    """AsyncSession on the shard that holds `user_id`'s expenses."""
+    return shards.session(shards.shard_of(user_id), **kw)
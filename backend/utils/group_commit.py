@@ -0,0 +1,146 @@
+# utils/group_commit.py
+"""
+Group commit for POST /api/expense/create (GROUP_COMMIT_ENABLED=1).
+
+Every create normally pays for its own transaction, and on SQLite all of them
+queue for the one writer lock. Here a create hands its row to the queue of
+its shard and waits: the queue is written out as one transaction - one
+INSERT for all rows, their rollup / balance deltas, one savings check per
+user, one commit - once GROUP_COMMIT_MAX_ROWS rows are waiting or
+GROUP_COMMIT_MAX_DELAY_MS after the first one arrived. While a transaction is
+being committed the next rows pile up behind it, so batches grow with load
+and a lone request only waits the delay.
+
+Each caller gets its own row's outcome: the new id, or the error. If a batch
+fails, its rows are retried one transaction each, so one bad row never fails
+the others.
+
+The queues live on the app's persistent event loop (utils/event_loop.py);
+without it requests run on loops of their own and every create commits alone.
+"""
+import asyncio
+import contextvars
+import logging
+
+from sqlalchemy import insert
+
+from models import Expense
+from utils.alert_user import check_and_notify
+from utils.event_loop import get_persistent_loop
+from utils.extensions import shards
+from utils.metrics import GROUP_COMMIT_ROWS
+from utils.rollup import RollupDelta
+
+log = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    """The write queue of one shard. Only used from the event loop it was created on."""
+
+    def __init__(self, app, index, max_rows, max_delay):
+        self.app = app
+        self.index = index
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending = []       # [(row, future)]
+        self._timer = None
+        self._writing = False
+
+    async def submit(self, row):
+        """Queue one validated expense row (Expense column values, user_id included); returns its id."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._start()
+        elif self._timer is None and not self._writing:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start)
+        return await future
+
+    def _start(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writing or not self._pending:
+            return
+        self._writing = True
+        # a context of its own: the queries are nobody's request in utils/metrics.py
+        asyncio.get_running_loop().create_task(self._write_all(), context=contextvars.Context())
+
+    async def _write_all(self):
+        try:
+            # whatever arrived during a commit goes out right after it
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+                await self._commit(batch)
+        finally:
+            self._writing = False
+            if self._pending:
+                self._start()
+
+    async def _commit(self, batch):
+        GROUP_COMMIT_ROWS.observe(len(batch))
+        try:
+            ids = await self._write([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error=e)
+                return
+            log.warning("group commit of %d rows failed, retrying them one by one: %s", len(batch), e)
+            for row, future in batch:
+                try:
+                    ids = await self._write([row])
+                except Exception as row_error:
+                    _resolve(future, error=row_error)
+                else:
+                    _resolve(future, ids[0])
+            return
+        for (_, future), expense_id in zip(batch, ids):
+            _resolve(future, expense_id)
+
+    async def _write(self, rows):
+        """create_expense's transaction for many rows at once; returns their ids in order."""
+        with self.app.app_context():     # check_and_notify reads current_app.config
+            async with shards.session(self.index) as session:
+                result = await session.execute(
+                    insert(Expense).returning(Expense.id, sort_by_parameter_order=True), rows
+                )
+                ids = result.scalars().all()
+
+                rollup = RollupDelta()
+                for row in rows:
+                    rollup.add(row["user_id"], row["timestamp"], row["category"], row["amount"])
+                await rollup.flush(session)
+
+                for user_id in dict.fromkeys(row["user_id"] for row in rows):
+                    await check_and_notify(user_id, session)
+                await session.commit()
+        return ids
+
+
+def _resolve(future, result=None, error=None):
+    if future.done():       # the caller went away (client disconnected)
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def get_group_committer(app, user_id):
+    """The queue for `user_id`'s shard, or None when group commit is off or unavailable.
+
+    `app` must be the real app (current_app._get_current_object()): the queue
+    outlives the request that creates it.
+    """
+    if not app.config["GROUP_COMMIT_ENABLED"] or get_persistent_loop(app) is None:
+        return None
+    committers = app.extensions.setdefault('group_committers', {})
+    index = shards.shard_of(user_id)
+    committer = committers.get(index)
+    if committer is None:
+        committer = committers.setdefault(index, GroupCommitter(
+            app, index,
+            max_rows=app.config["GROUP_COMMIT_MAX_ROWS"],
+            max_delay=app.config["GROUP_COMMIT_MAX_DELAY_MS"] / 1000,
+        ))
+    return committer
@@ -0,0 +1,76 @@
+# utils/hashing.py
+"""
+bcrypt off the event loop.
+
+bcrypt at cost 12 takes ~250 ms of CPU. Running it inside an async view
+stalls every other request on that loop, so hashing and verification go to a
+small dedicated thread pool (bcrypt releases the GIL while it works). The pool
+has a bounded queue: when it is full, callers get HasherBusy straight away
+instead of piling up behind a login storm.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Too many hashes in flight; the caller should answer 503."""
+
+
+def hash_cost(hashed):
+    """Cost factor stored in a bcrypt hash, e.g. 12 for b'$2b$12$...'."""
+    return int(hashed.split(b'$')[2])
+
+
+class PasswordHasher:
+
+    def __init__(self, rounds=12, max_workers=4, max_queue=64):
+        self.rounds = rounds
+        self.max_in_flight = max_workers + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # max_workers=0 keeps the old behaviour (hash inline), e.g. for benchmarks
+        self._executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix='bcrypt') if max_workers else None
+        )
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                raise HasherBusy()
+            self._in_flight += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def hash(self, password):
+        return await self._run(
+            lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        )
+
+    async def verify(self, password, hashed):
+        return await self._run(bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def get_password_hasher(app):
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = app.extensions.setdefault('password_hasher', PasswordHasher(
+            rounds=app.config['BCRYPT_ROUNDS'],
+            max_workers=app.config['BCRYPT_MAX_WORKERS'],
+            max_queue=app.config['BCRYPT_MAX_QUEUE'],
+        ))
+    return hasher
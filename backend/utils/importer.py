@@ -0,0 +1,47 @@
+# utils/importer.py
+import csv
+import io
+import json
+
+CSV_TYPES = ('text/csv', 'application/csv')
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+
+def detect_format(fmt, content_type):
+    """'csv' or 'ndjson' from ?format= or the request Content-Type, else None."""
+    if fmt:
+        return fmt.lower() if fmt.lower() in ('csv', 'ndjson') else None
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if mimetype in CSV_TYPES:
+        return 'csv'
+    if mimetype in NDJSON_TYPES:
+        return 'ndjson'
+    return None
+
+
+def iter_records(stream, fmt):
+    """Yield (row_number, dict) from a binary upload stream without reading it all into memory.
+
+    CSV needs a header row (amount,categoryName,title,date); NDJSON is one
+    JSON object per line. A line that does not parse yields (row_number, None).
+    """
+    if not hasattr(stream, 'read1'):
+        stream = io.BufferedReader(stream)   # werkzeug hands us a raw stream
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+
+    if fmt == 'csv':
+        # DictReader pulls from the wrapper one line at a time
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield row_number, record if isinstance(record, dict) else None
@@ -0,0 +1,38 @@
+# utils/json_response.py
+"""
+Fast JSON for the read endpoints.
+
+Uses orjson (a Pipfile dependency), which encodes datetimes itself and
+writes straight to bytes. Where it can't be installed this falls back to the
+stdlib json module with the same output, just slower.
+"""
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:     # e.g. no wheel for this platform
+    orjson = None
+
+
+def _default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Encode to UTF-8 JSON bytes; datetimes come out as isoformat() strings."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def rows_to_dicts(rows, fields):
+    """Row tuples -> one dict per row keyed by `fields` (extra trailing columns are dropped)."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,204 @@
+# utils/metrics.py
+"""
+Request, database and SMTP metrics, served in Prometheus text format on /metrics.
+
+No client library needed: a handful of counters / histograms guarded by one
+lock each. Per request the hot path costs two perf_counter() calls, a few dict
+updates and, for every SQL statement, two more perf_counter() calls.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+# seconds; the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+BATCH_ROWS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}     # labels -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        names = self.labelnames + ('le',)
+        for labels, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                yield self.name + '_bucket', _labels(names, labels + (bound,)), running
+            yield self.name + '_count', _labels(self.labelnames, labels), running
+            yield self.name + '_sum', _labels(self.labelnames, labels), total
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.add(Counter(
+    'http_requests_total', 'Requests handled, by route and status.', ('method', 'route', 'status')))
+REQUEST_SECONDS = REGISTRY.add(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('route',)))
+IN_FLIGHT = REGISTRY.add(Gauge(
+    'http_requests_in_flight', 'Requests currently being handled.'))
+DB_QUERIES = REGISTRY.add(Counter(
+    'db_queries_total', 'SQL statements executed.'))
+DB_QUERY_SECONDS = REGISTRY.add(Histogram(
+    'db_query_duration_seconds', 'Time per SQL statement.'))
+DB_QUERIES_PER_REQUEST = REGISTRY.add(Histogram(
+    'db_queries_per_request', 'SQL statements issued by one request.', ('route',), QUERY_COUNT_BUCKETS))
+DB_SECONDS_PER_REQUEST = REGISTRY.add(Histogram(
+    'db_seconds_per_request', 'Database time of one request.', ('route',)))
+SMTP_SECONDS = REGISTRY.add(Histogram(
+    'smtp_send_duration_seconds', 'Time to hand one alert e-mail to the SMTP server.', ('result',)))
+ALERTS_QUEUED = REGISTRY.add(Counter(
+    'alerts_queued_total', 'Savings alerts written to the outbox by check_and_notify.'))
+RATE_LIMITED = REGISTRY.add(Counter(
+    'http_requests_rate_limited_total', 'Requests turned away with 429 (middlewares/rate_limit.py).', ('route', 'reason')))
+GROUP_COMMIT_ROWS = REGISTRY.add(Histogram(
+    'group_commit_rows', 'Expenses written by one group commit (utils/group_commit.py).', (), BATCH_ROWS_BUCKETS))
+
+# [statements, seconds] of the request being handled; the async views run in a
+# copy of the request's context, so they mutate the same list
+_request_db = contextvars.ContextVar('request_db', default=None)
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def instrument_app(app):
+    """Time every request and count its SQL statements."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_db = [0, 0.0]
+        g._metrics_token = _request_db.set(g._metrics_db)
+        g._metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = _route()
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route)
+            REQUESTS.inc(request.method, route, response.status_code)
+            statements, seconds = g.pop('_metrics_db', (0, 0.0))
+            DB_QUERIES_PER_REQUEST.observe(statements, route)
+            DB_SECONDS_PER_REQUEST.observe(seconds, route)
+        return response
+
+    @app.teardown_request
+    def _done(exc):
+        token = g.pop('_metrics_token', None)
+        if token is not None:       # i.e. _start_timer ran
+            _request_db.reset(token)
+            IN_FLIGHT.dec()
+
+
+def metrics_response():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument_engine(engine):
+    """Count and time every statement run through `engine` (an AsyncEngine)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_metrics_started'].pop()
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.observe(elapsed)
+        current = _request_db.get()
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def _failed(context):
+        started = context.connection.info.get('_metrics_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def observe_smtp(seconds, result):
+    SMTP_SECONDS.observe(seconds, result)
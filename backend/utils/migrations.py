@@ -0,0 +1,109 @@
+# utils/migrations.py
+"""
+Tiny versioned schema migrations.
+
+Every file in backend/migrations/ named NNNN_description.py is one step and
+defines upgrade(conn) / downgrade(conn), both taking a synchronous SQLAlchemy
+Connection (the runner hands them the async engine's connection via run_sync). The version reached so far is recorded in schema_migrations.
+Run them with `flask db upgrade` / `flask db downgrade --to N`.
+"""
+import asyncio
+import importlib
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, select
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+Migration = namedtuple('Migration', 'version name module')
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(120), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def available_migrations():
+    """All migration steps on disk, oldest first."""
+    steps = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d{4})_(\w+)\.py$', filename)
+        if match:
+            module = importlib.import_module(f'migrations.{filename[:-3]}')
+            steps.append(Migration(int(match.group(1)), match.group(2), module))
+    return steps
+
+
+def applied_versions(conn):
+    _metadata.create_all(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _apply(conn, step, direction):
+    """Run one step on a sync connection; returns False if it was already in that state."""
+    applied = step.version in applied_versions(conn)
+    if direction == 'upgrade':
+        if applied:
+            return False
+        step.module.upgrade(conn)
+        conn.execute(insert(schema_migrations).values(
+            version=step.version, name=step.name, applied_at=datetime.utcnow()
+        ))
+    else:
+        if not applied:
+            return False
+        step.module.downgrade(conn)
+        conn.execute(delete(schema_migrations).where(schema_migrations.c.version == step.version))
+    return True
+
+
+async def current_version(engine):
+    async with engine.begin() as conn:
+        return max(await conn.run_sync(applied_versions), default=0)
+
+
+async def upgrade(engine, target=None):
+    """Apply every pending step up to `target` (default: latest). Returns the versions applied."""
+    applied = []
+    for step in available_migrations():
+        if target is not None and step.version > target:
+            break
+        # one transaction per step, so a failure leaves the schema at the previous version
+        async with engine.begin() as conn:
+            if await conn.run_sync(_apply, step, 'upgrade'):
+                applied.append(step.version)
+    return applied
+
+
+async def downgrade(engine, target):
+    """Revert applied steps newer than `target`, newest first. Returns the versions reverted."""
+    reverted = []
+    for step in reversed(available_migrations()):
+        if step.version <= target:
+            break
+        async with engine.begin() as conn:
+            if await conn.run_sync(_apply, step, 'downgrade'):
+                reverted.append(step.version)
+    return reverted
+
+
+def upgrade_blocking(engine):
+    """upgrade() for app startup, which may already be inside uvicorn's running loop.
+
+    Runs on a throwaway thread + loop and disposes the pool afterwards, so no
+    connection opened here is reused by request handlers.
+    """
+    async def run():
+        try:
+            return await upgrade(engine)
+        finally:
+            await engine.dispose()
+
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(asyncio.run, run()).result()
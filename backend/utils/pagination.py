@@ -0,0 +1,45 @@
+# utils/pagination.py
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp, expense_id):
+    """Opaque cursor pointing just after the (timestamp, id) of the last row served."""
+    raw = json.dumps([timestamp.isoformat(), expense_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError on anything malformed."""
+    try:
+        ts, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(ts), int(expense_id)
+    except (TypeError, ValueError, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_offset(offset):
+    """Opaque cursor for result lists that are not keyed on (timestamp, id), e.g. ranked search."""
+    return base64.urlsafe_b64encode(json.dumps(['o', offset]).encode('utf-8')).decode('ascii')
+
+
+def decode_offset(cursor):
+    """Inverse of encode_offset(); raises ValueError on anything malformed."""
+    try:
+        kind, offset = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if kind != 'o' or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except (TypeError, ValueError, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a ?limit= value into [1, MAX_PAGE_SIZE]."""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), MAX_PAGE_SIZE))
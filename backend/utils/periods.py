@@ -0,0 +1,67 @@
+# utils/periods.py
+from datetime import date, timedelta
+
+from sqlalchemy import func, literal_column
+
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket_expr(dialect, period, column):
+    """SQL expression labelling `column` with its day / week / month bucket.
+
+    Labels sort chronologically as strings: '2024-07-15' for a day, the
+    Monday it starts on for a week, '2024-07' for a month.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+    # formats are inlined rather than bound: Postgres only accepts
+    # SELECT to_char(ts, $1) ... GROUP BY to_char(ts, $2) if it can see they match
+    if dialect == 'postgresql':
+        if period == 'week':
+            return func.to_char(func.date_trunc(_sql('week'), column), _sql('YYYY-MM-DD'))
+        return func.to_char(column, _sql('YYYY-MM-DD' if period == 'day' else 'YYYY-MM'))
+
+    # SQLite: 'weekday 0' moves to the coming Sunday (or stays on one), -6 days is that week's Monday
+    if period == 'week':
+        return func.date(column, _sql('weekday 0'), _sql('-6 days'))
+    return func.strftime(_sql('%Y-%m-%d' if period == 'day' else '%Y-%m'), column)
+
+
+def _sql(constant):
+    return literal_column(f"'{constant}'")
+
+
+def bucket_start(period, day):
+    """First day of the bucket `day` (a date) falls in."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_label(period, day):
+    """The label bucket_expr() gives a timestamp on `day`."""
+    start = bucket_start(period, day)
+    return start.strftime('%Y-%m') if period == 'month' else start.isoformat()
+
+
+def bucket_labels(period, first, last, limit=None):
+    """Every bucket label from `first` to `last` (dates, inclusive), oldest first.
+
+    Raises ValueError when there would be more than `limit` of them.
+    """
+    labels = []
+    day = bucket_start(period, first)
+    while day <= last:
+        if limit is not None and len(labels) >= limit:
+            raise ValueError(f"range spans more than {limit} {period} buckets")
+        labels.append(bucket_label(period, day))
+        if period == 'day':
+            day += timedelta(days=1)
+        elif period == 'week':
+            day += timedelta(days=7)
+        else:
+            day = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return labels
@@ -0,0 +1,185 @@
+# utils/profiler.py
+"""
+On-demand sampling profiles of single requests (PROFILE_ENABLED=1).
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` or is
+picked by PROFILE_SAMPLE_RATE. While it runs, a sampler thread looks at the
+stacks every PROFILE_INTERVAL_MS: when some thread is executing the
+request's view coroutine (normally the event loop of utils/event_loop.py)
+that stack is recorded under [view], otherwise the stack of the thread
+handling the request under [request]. So the profile is the wall-clock time
+of this request only - before_request hooks, protectRoute, the queries, ORM
+and jsonify - including the time it sat waiting on the database, and other
+requests sharing the loop don't show up in it.
+
+Each profile is written to PROFILE_DIR in the folded-stack format
+("frame;frame;frame count" per line) that flamegraph.pl, speedscope and
+inferno read; only the newest PROFILE_MAX_FILES are kept. The response
+carries the file name in X-Profile-File.
+
+With PROFILE_ENABLED=0 (the default) install_profiler() is never called,
+so requests run exactly as without this module.
+"""
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from flask import g, request
+
+log = logging.getLogger(__name__)
+
+MAX_DEPTH = 200
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame, root=None):
+    """Folded stack of `frame`, outermost first; starts at `root` when given."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_label(frame.f_code))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfile:
+    """Samples one request's stacks on a background thread until stop()."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id     # the thread running the WSGI side of the request
+        self.interval = interval
+        self.coroutine_frame = None    # set by the view wrapper once the coroutine runs
+        self.samples = Counter()
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            self._stop.set()
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        frames = sys._current_frames()
+        target = self.coroutine_frame
+        if target is not None:
+            for frame in frames.values():
+                walk = frame
+                while walk is not None and walk is not target:
+                    walk = walk.f_back
+                if walk is not None:
+                    self.samples['[view];' + _stack(frame, root=target)] += 1   # no event loop frames
+                    return
+        frame = frames.get(self.thread_id)
+        if frame is not None:
+            self.samples['[request];' + _stack(frame)] += 1
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _profile_wanted(config):
+    token = config["PROFILE_TOKEN"]
+    header = request.headers.get('X-Profile')
+    # headers arrive latin-1 decoded: compare bytes, compare_digest refuses non-ASCII str
+    if token and header and hmac.compare_digest(header.encode('utf-8', 'surrogateescape'), token.encode('utf-8')):
+        return True
+    rate = config["PROFILE_SAMPLE_RATE"]
+    return rate > 0 and random.random() < rate
+
+
+def _prune(directory, keep):
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.folded'))
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def _write(profile, directory, keep):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    name = "{}-{}-{}-{}ms.folded".format(
+        datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+        request.method,
+        route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root',
+        round(profile.elapsed * 1000),
+    )
+    with open(os.path.join(directory, name), 'w') as f:
+        f.write(profile.folded())
+    _prune(directory, keep)
+    log.info("request profile written path=%s samples=%d", name, sum(profile.samples.values()))
+    return name
+
+
+def install_profiler(app):
+    """Profile the requests picked by PROFILE_TOKEN / PROFILE_SAMPLE_RATE. Call before other before_request hooks."""
+    config = app.config
+    directory = config["PROFILE_DIR"]
+    keep = config["PROFILE_MAX_FILES"]
+    interval = config["PROFILE_INTERVAL_MS"] / 1000
+    os.makedirs(directory, exist_ok=True)
+
+    ensure_sync = app.ensure_sync
+
+    def profiled_ensure_sync(func):
+        # the view coroutine's own frame marks its samples, whichever thread runs it
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def view(*args, **kwargs):
+                profile = g.get('_profile')
+                if profile is not None:
+                    profile.coroutine_frame = sys._getframe()
+                return await func(*args, **kwargs)
+            return ensure_sync(view)
+        return ensure_sync(func)
+
+    app.ensure_sync = profiled_ensure_sync
+
+    @app.before_request
+    def _start_profile():
+        if _profile_wanted(config):
+            g._profile = RequestProfile(threading.get_ident(), interval).start()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            try:
+                response.headers['X-Profile-File'] = _write(profile.stop(), directory, keep)
+            except OSError as e:
+                log.warning("request profile not written: %s", e)
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request did not run (unhandled error): still write what we have
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            try:
+                _write(profile.stop(), directory, keep)
+            except OSError as e:
+                log.warning("request profile not written: %s", e)
@@ -0,0 +1,268 @@
+# utils/response_cache.py
+"""
+Per-user cache for the dashboard's read endpoints.
+
+    @expense_bp.route('/recent')
+    @protectRoute
+    @cached_response('recent')
+    async def recent_six_expenses(): ...
+
+Entries are keyed by (user, endpoint, query string) and dropped as soon as
+that user writes: create/edit/delete/import and updateProfile call
+invalidate_user() after their commit. Every cached response carries an ETag,
+so a dashboard that already has the data gets a bodyless 304.
+
+RESPONSE_CACHE_BACKEND picks the store:
+  memory - in-process LRU, for a single worker
+  sqlite - a local SQLite file (RESPONSE_CACHE_PATH) shared by all workers on the host;
+           its calls run on a small thread pool so a busy file never stalls the event loop
+  none   - off
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from flask import Response, current_app, g, make_response, request
+
+log = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """Bounded LRU with a TTL; invalidation is O(1) and its bookkeeping is bounded too.
+
+    A global clock ticks on every invalidate(). version() hands out the
+    current tick, entries remember the tick their response was read at, and
+    an entry (or a put) is only good if it was read after the user's last
+    invalidation. Those last-invalidation ticks live in an LRU of `maxsize`
+    users; when one falls out, _floor takes its tick, so a forgotten user's
+    last invalidation only ever moves forward - at worst a few entries older
+    than it are dropped early, a stale one is never served.
+    """
+
+    blocking = False
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()       # key -> (read tick, expires, etag, mimetype, body)
+        self._invalidated = OrderedDict()   # user_id -> tick of their last invalidate()
+        self._floor = 0                     # newest tick evicted from _invalidated
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def version(self, user_id):
+        return self._clock
+
+    def _fresh(self, user_id, tick):
+        return tick >= self._invalidated.get(user_id, self._floor)
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            tick, expires, etag, mimetype, body = entry
+            if not self._fresh(user_id, tick) or expires <= time.time():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return etag, mimetype, body
+
+    def put(self, user_id, key, version, etag, mimetype, body):
+        with self._lock:
+            if not self._fresh(user_id, version):
+                return      # the user wrote while this response was being built
+            self._entries[(user_id, key)] = (version, time.time() + self.ttl, etag, mimetype, body)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            # stale entries are skipped by get() and age out of the LRU
+            self._clock += 1
+            self._invalidated[user_id] = self._clock
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self.maxsize:
+                _, tick = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, tick)
+
+
+class SQLiteCache:
+    """Same contract as MemoryCache, stored in a local SQLite file so workers share it."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS response_cache ("
+        " user_id TEXT, key TEXT, version INTEGER, expires REAL, used REAL,"
+        " etag TEXT, mimetype TEXT, body BLOB, PRIMARY KEY (user_id, key))",
+        "CREATE INDEX IF NOT EXISTS ix_response_cache_used ON response_cache (used)",
+        "CREATE TABLE IF NOT EXISTS response_cache_version (user_id TEXT PRIMARY KEY, version INTEGER)",
+    )
+
+    blocking = True     # sqlite3 waits up to `timeout` for the write lock
+
+    def __init__(self, path, maxsize, ttl):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")     # it's a cache
+            self._local.conn = conn
+        return conn
+
+    def version(self, user_id):
+        row = self._conn().execute(
+            "SELECT version FROM response_cache_version WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, user_id, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT c.etag, c.mimetype, c.body FROM response_cache c"
+            " LEFT JOIN response_cache_version v ON v.user_id = c.user_id"
+            " WHERE c.user_id = ? AND c.key = ? AND c.expires > ?"
+            " AND c.version = coalesce(v.version, 0)",
+            (str(user_id), key, now),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE response_cache SET used = ? WHERE user_id = ? AND key = ?",
+                (now, str(user_id), key),
+            )
+        return row
+
+    def put(self, user_id, key, version, etag, mimetype, body):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version != self.version(user_id):
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(user_id), key, version, now + self.ttl, now, etag, mimetype, body),
+            )
+            conn.execute(
+                "DELETE FROM response_cache WHERE rowid IN ("
+                " SELECT rowid FROM response_cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+        finally:
+            conn.execute("COMMIT")
+
+    def invalidate(self, user_id):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO response_cache_version VALUES (?, 1)"
+                " ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+                (str(user_id),),
+            )
+            conn.execute("DELETE FROM response_cache WHERE user_id = ?", (str(user_id),))
+        finally:
+            conn.execute("COMMIT")
+
+
+def get_response_cache(app):
+    """The app's cache backend, or None when RESPONSE_CACHE_BACKEND=none."""
+    if 'response_cache' not in app.extensions:
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        size, ttl = app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL']
+        if backend == 'memory':
+            cache = MemoryCache(size, ttl)
+        elif backend == 'sqlite':
+            cache = SQLiteCache(app.config['RESPONSE_CACHE_PATH'], size, ttl)
+        elif backend == 'none':
+            cache = None
+        else:
+            raise ValueError(f"RESPONSE_CACHE_BACKEND must be memory, sqlite or none, not {backend!r}")
+        app.extensions.setdefault('response_cache', cache)
+    return app.extensions['response_cache']
+
+
+_blocking_pool = ThreadPoolExecutor(4, thread_name_prefix='response-cache')
+
+
+async def _call(cache, method, *args):
+    """cache.method(*args), off the event loop when the backend blocks."""
+    if not cache.blocking:
+        return getattr(cache, method)(*args)
+    return await asyncio.get_running_loop().run_in_executor(_blocking_pool, partial(getattr(cache, method), *args))
+
+
+def _store(cache, *args):
+    """cache.put(*args); a blocking backend does it in the background - the response is ready anyway."""
+    if not cache.blocking:
+        cache.put(*args)
+        return
+    _blocking_pool.submit(cache.put, *args).add_done_callback(_log_put_error)
+
+
+def _log_put_error(future):
+    if future.exception() is not None:
+        log.warning("response cache put failed: %s", future.exception())
+
+
+async def invalidate_user(user_id):
+    """Forget every cached response of this user; call (and await) after the write has committed."""
+    cache = get_response_cache(current_app)
+    if cache is not None and user_id is not None:
+        await _call(cache, 'invalidate', str(user_id))
+
+
+def _respond(etag, mimetype, body):
+    if request.if_none_match.contains(etag):
+        res = Response(status=304)
+    else:
+        res = Response(body, mimetype=mimetype)
+    res.set_etag(etag)
+    res.headers['Cache-Control'] = 'private, no-cache'    # browsers revalidate with If-None-Match
+    return res
+
+
+def cached_response(name):
+    """Cache a protected GET view's 200 responses per user. Goes under @protectRoute."""
+
+    def decorator(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            cache = get_response_cache(current_app)
+            if cache is None:
+                return await f(*args, **kwargs)
+
+            user_id = str(g.current_user)
+            key = name + '?' + request.query_string.decode('latin-1')
+            hit = await _call(cache, 'get', user_id, key)
+            if hit is not None:
+                return _respond(*hit)
+
+            version = await _call(cache, 'version', user_id)
+            res = make_response(await f(*args, **kwargs))
+            if res.status_code != 200 or res.is_streamed:
+                return res
+            body = res.get_data()
+            etag = hashlib.sha1(body).hexdigest()[:20]
+            _store(cache, user_id, key, version, etag, res.mimetype, body)
+            return _respond(etag, res.mimetype, body)
+
+        return wrapper
+    return decorator
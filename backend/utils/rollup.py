@@ -0,0 +1,107 @@
+# utils/rollup.py
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Expense, ExpenseRollup
+from utils.balance import adjust_balances
+from utils.periods import bucket_expr
+
+ALL_CATEGORIES = ''   # category key of the row holding the whole month
+
+
+def month_key(timestamp):
+    return timestamp.strftime('%Y-%m')  # '2024-07' format
+
+
+def _upsert(session):
+    """INSERT ... ON CONFLICT for whichever database the session is bound to."""
+    dialect = session.get_bind().dialect.name
+    table_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = table_insert(ExpenseRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'month', 'category'],
+        set_={
+            'total': ExpenseRollup.total + stmt.excluded.total,
+            'count': ExpenseRollup.count + stmt.excluded.count,
+        },
+    )
+
+
+class RollupDelta:
+    """Collects expense changes and writes them to expense_rollup and user_balance in one go.
+
+    Call add()/remove() for every expense touched, then flush(session) before
+    the commit so the rollups move in the same transaction as the expenses.
+    """
+
+    def __init__(self):
+        self._cells = defaultdict(lambda: [0.0, 0])
+        self._balances = defaultdict(lambda: [0.0, 0])
+
+    def add(self, user_id, timestamp, category, amount, count=1):
+        month = month_key(timestamp)
+        # the controllers refuse blank categories; if one slips through it still counts once
+        keys = (category,) if category == ALL_CATEGORIES else (category, ALL_CATEGORIES)
+        for key in keys:
+            cell = self._cells[(int(user_id), month, key)]
+            cell[0] += amount
+            cell[1] += count
+        balance = self._balances[int(user_id)]
+        balance[0] += amount
+        balance[1] += count
+
+    def remove(self, user_id, timestamp, category, amount, count=1):
+        self.add(user_id, timestamp, category, -amount, -count)
+
+    async def flush(self, session):
+        await adjust_balances(session, self._balances)
+        self._balances.clear()
+
+        rows = [
+            {"user_id": user_id, "month": month, "category": category, "total": total, "count": count}
+            for (user_id, month, category), (total, count) in self._cells.items()
+            if total or count
+        ]
+        if not rows:
+            return
+
+        await session.execute(_upsert(session), rows)
+        # months (or categories) with nothing left in them should not linger
+        await session.execute(
+            delete(ExpenseRollup).where(
+                ExpenseRollup.user_id.in_({r["user_id"] for r in rows}),
+                ExpenseRollup.count <= 0,
+            )
+        )
+        self._cells.clear()
+
+
+async def rebuild_rollups(session, user_id=None):
+    """Recompute expense_rollup from the expense table (all users, or just one).
+
+    Used to backfill existing databases and to repair drift; the caller commits.
+    """
+    clear = delete(ExpenseRollup)
+    if user_id is not None:
+        clear = clear.where(ExpenseRollup.user_id == user_id)
+    await session.execute(clear)
+
+    month = bucket_expr(session.get_bind().dialect.name, 'month', Expense.timestamp)
+    for category, group_by, where in (
+        (Expense.category, (Expense.user_id, month, Expense.category), Expense.category != ALL_CATEGORIES),
+        (literal(ALL_CATEGORIES), (Expense.user_id, month), None),
+    ):
+        source = (
+            select(Expense.user_id, month, category, func.sum(Expense.amount), func.count())
+            .where(Expense.timestamp.is_not(None))
+            .group_by(*group_by)
+        )
+        if where is not None:
+            source = source.where(where)
+        if user_id is not None:
+            source = source.where(Expense.user_id == user_id)
+        await session.execute(
+            insert(ExpenseRollup).from_select(
+                ['user_id', 'month', 'category', 'total', 'count'], source
+            )
+        )
@@ -0,0 +1,71 @@
+# utils/search.py
+"""
+Full-text match and rank expressions for /api/expense/search.
+
+The index itself is built by migrations/0006_expense_search.py: an FTS5 table
+on SQLite, a GIN tsvector index on PostgreSQL. Every word of the query is a
+prefix ("ub" finds "Uber") and all of them must match, in the title or the
+category. Matches with every word in the title rank first, then newest first.
+
+On SQLite an entry's FTS rowid is user_id << 32 | expense.id, so one user's
+entries sit next to each other in every term's list and a search only reads
+that user's slice. Prefixes of 2..MAX_PREFIX characters have their own index
+for the same reason; longer words are looked up by their first MAX_PREFIX
+characters and checked against the row. bm25() is not used: it counts every
+user's rows for each term, which makes a search as slow as the table is big.
+"""
+import re
+
+from sqlalchemy import func, literal_column, select, table, column
+
+from models import Expense
+
+MAX_TERMS = 8
+MIN_TERM = 2
+MAX_PREFIX = 6       # prefix='2 3 4 5 6' in migrations/0006_expense_search.py
+USER_SHIFT = 32
+
+_fts = table('expense_fts', column('rowid'))
+_match = literal_column('expense_fts').op('MATCH')
+
+
+def search_terms(q):
+    """Lower-cased words of the query, at most MAX_TERMS; punctuation and 1-letter words are dropped."""
+    return [w for w in re.findall(r'\w+', (q or '').lower()) if len(w) >= MIN_TERM][:MAX_TERMS]
+
+
+def supports_search(dialect):
+    return dialect in ('sqlite', 'postgresql')
+
+
+def _fts5_query(terms, columns):
+    words = ' AND '.join(f'"{t[:MAX_PREFIX]}"*' for t in terms)
+    return f'{{{columns}}} : ({words})'
+
+
+def apply_search(stmt, dialect, user_id, terms):
+    """Restrict `stmt` (a select from expense for `user_id`) to rows matching every term.
+
+    Returns (stmt, title_hit); order by title_hit descending to put title
+    matches first.
+    """
+    if dialect == 'sqlite':
+        low = int(user_id) << USER_SHIFT
+        in_user = _fts.c.rowid.between(low, low + (1 << USER_SHIFT) - 1)
+        stmt = (
+            stmt.join(_fts, Expense.id == _fts.c.rowid - low)
+            .where(_match(_fts5_query(terms, 'title category')), in_user)
+        )
+        document = func.lower(Expense.title.op('||')(' ').op('||')(Expense.category))
+        for term in terms:
+            if len(term) > MAX_PREFIX:
+                stmt = stmt.where(document.contains(term, autoescape=True))
+        in_title = select(_fts.c.rowid).where(_match(_fts5_query(terms, 'title')), in_user).correlate(None)
+        return stmt, _fts.c.rowid.in_(in_title)
+
+    # must stay the exact expression the GIN index was built on
+    config = literal_column("'simple'")
+    document = func.to_tsvector(config, Expense.title.op('||')(literal_column("' '")).op('||')(Expense.category))
+    query = func.to_tsquery(config, ' & '.join(f'{t}:*' for t in terms))
+    stmt = stmt.where(document.op('@@')(query))
+    return stmt, func.to_tsvector(config, Expense.title).op('@@')(query)
@@ -0,0 +1,193 @@
+# utils/shards.py
+"""
+Keeping the shard databases (SHARD_URLS, see utils/extensions.ShardRouter) in order.
+
+A user's expenses, expense_rollup, user_balance and alert_outbox rows all live
+on that user's shard, so every write is one transaction on one database. The
+users table is owned by DATABASE_URL; each shard also keeps a copy of its
+users' rows (no password hash) because load_savings joins on it and the
+foreign keys point at it. sync_user() writes that copy whenever the main row
+changes.
+
+rebalance() moves users whose rows are not on the shard the router picks for
+them - after a URL was appended to SHARD_URLS, or to move data off DATABASE_URL
+or a retired database. It is a maintenance step like `flask db upgrade`: stop
+writes while it runs. Each user is copied and committed on the target before
+being deleted from the source, so an interrupted run can simply be restarted.
+Moved expenses get new ids on the target.
+"""
+from functools import partial
+
+from sqlalchemy import delete, insert, select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from models import AlertOutbox, Expense, ExpenseRollup, User, UserBalance
+from utils.extensions import async_database_url, async_session, create_engine_from_config, shards
+
+# what a shard needs to know about a user (load_savings)
+USER_COPY_COLUMNS = (User.id, User.username, User.email, User.income)
+# per-user data, moved together; the users copy goes last
+SHARDED_MODELS = (Expense, ExpenseRollup, UserBalance, AlertOutbox)
+MOVE_CHUNK = 1000    # rows per INSERT while moving a user
+
+
+def _user_copy(user):
+    return {
+        "id": user.id, "username": user.username, "email": user.email, "income": user.income,
+        "password_hash": b"", "description": "",
+    }
+
+
+async def upsert_user_copies(session, users):
+    """Insert or refresh the shard copies of `users` (rows / Users with USER_COPY_COLUMNS); the caller commits."""
+    rows = [_user_copy(user) for user in users]
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    stmt = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(User)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={c: stmt.excluded[c] for c in ('username', 'email', 'income')},
+    )
+    await session.execute(stmt, rows)
+
+
+async def sync_user(user):
+    """Write `user`'s copy to their shard and commit it. No-op when that shard is DATABASE_URL.
+
+    Call it before committing the change to the main row: if this fails the
+    request fails as a whole, and a copy left behind by a failed main commit
+    is overwritten by the next sync.
+    """
+    index = shards.shard_of(user.id)
+    if shards.is_main(index):
+        return
+    async with shards.session(index) as session:
+        await upsert_user_copies(session, [user])
+        await session.commit()
+
+
+# ------------------------- REBALANCE -------------------------
+def _user_ids(model):
+    return select(model.user_id).distinct()
+
+
+async def _users_on(session, include_copies):
+    """Every user_id with rows in this database (and with a users copy, if asked)."""
+    parts = [_user_ids(model) for model in SHARDED_MODELS]
+    if include_copies:
+        parts.append(select(User.id))
+    return set((await session.execute(union(*parts))).scalars())
+
+
+async def _copy_rows(source, target, model, user_id):
+    table = model.__table__
+    # the target may hold part of this user from an interrupted run: start over
+    await target.execute(delete(table).where(table.c.user_id == user_id))
+    # ids are left to the target (they would clash with its own rows), except
+    # where the primary key is the user (user_balance) or includes it (rollups)
+    columns = [c for c in table.c if not (c.primary_key and c.name == 'id')]
+    result = await source.stream(
+        select(*columns).where(table.c.user_id == user_id).execution_options(yield_per=MOVE_CHUNK)
+    )
+    moved = 0
+    async for rows in result.partitions():
+        await target.execute(insert(table), [row._asdict() for row in rows])
+        moved += len(rows)
+    return moved
+
+
+async def _move_user(source, target, user_id, user_row):
+    """Copy one user's rows from `source` to `target`, commit there, then delete them from `source`.
+
+    user_row is the users copy to write on the target (None when the target is DATABASE_URL).
+    """
+    moved = {}
+    if user_row is not None:
+        await upsert_user_copies(target, [user_row])
+    for model in SHARDED_MODELS:
+        moved[model.__tablename__] = await _copy_rows(source, target, model, user_id)
+    await target.commit()
+
+    for model in SHARDED_MODELS:
+        await source.execute(delete(model).where(model.user_id == user_id))
+    await source.commit()
+    return moved
+
+
+def _display(url):
+    return async_database_url(url).render_as_string(hide_password=True)
+
+
+async def _main_user(user_id):
+    async with async_session() as main:
+        return (await main.execute(select(*USER_COPY_COLUMNS).where(User.id == user_id))).one_or_none()
+
+
+async def _sync_all_copies():
+    """Give every user homed away from DATABASE_URL an up-to-date copy on their shard."""
+    if all(shards.is_main(index) for index in range(shards.count)):
+        return
+    async with async_session() as main:
+        ids = (await main.execute(select(User.id))).scalars().all()
+    by_shard = {}
+    for user_id in ids:
+        index = shards.shard_of(user_id)
+        if not shards.is_main(index):
+            by_shard.setdefault(index, []).append(user_id)
+
+    for index, user_ids in by_shard.items():
+        for start in range(0, len(user_ids), MOVE_CHUNK):
+            chunk = user_ids[start:start + MOVE_CHUNK]
+            async with async_session() as main:
+                users = (await main.execute(select(*USER_COPY_COLUMNS).where(User.id.in_(chunk)))).all()
+            async with shards.session(index) as target:
+                await upsert_user_copies(target, users)
+                await target.commit()
+
+
+async def rebalance(retired_urls=(), dry_run=False):
+    """Put every user's rows on the shard the router picks for them.
+
+    Looks at DATABASE_URL, every shard and `retired_urls` (databases taken out
+    of SHARD_URLS). Returns {(from url, to url): users moved}; with dry_run
+    nothing is written and the same counts are returned.
+    """
+    # (url, shard indexes it serves, session factory, is DATABASE_URL)
+    sources = [(shards.main.url, {i for i in range(shards.count) if shards.is_main(i)}, async_session, True)]
+    sources += [(shards.engine(i).url, {i}, partial(shards.session, i), False)
+                for i in range(shards.count) if not shards.is_main(i)]
+    retired = [create_engine_from_config({**shards.settings, 'SQLALCHEMY_DATABASE_URI': url, 'DB_POOL_SIZE': 1})
+               for url in retired_urls]
+    sources += [(engine.url, set(), sessionmaker(engine, class_=AsyncSession, expire_on_commit=False), False)
+                for engine in retired]
+
+    moves = {}
+    try:
+        if not dry_run:
+            await _sync_all_copies()
+
+        for url, homes, Session, is_main in sources:
+            async with Session() as source:
+                for user_id in sorted(await _users_on(source, include_copies=not is_main)):
+                    home = shards.shard_of(user_id)
+                    if home in homes:
+                        continue
+                    key = (_display(url), _display(shards.urls[home]))
+                    moves[key] = moves.get(key, 0) + 1
+                    if dry_run:
+                        continue
+
+                    user_row = await _main_user(user_id)
+                    async with shards.session(home) as target:
+                        await _move_user(source, target, user_id, None if shards.is_main(home) else user_row)
+                    if not is_main:
+                        # the copy goes last: on PostgreSQL the moved rows' foreign keys needed it
+                        await source.execute(delete(User).where(User.id == user_id))
+                        await source.commit()
+    finally:
+        for engine in retired:
+            await engine.dispose()
+    return moves
@@ -0,0 +1,38 @@
+# utils/streaming.py
+import asyncio
+import zlib
+
+
+def iter_async(agen, persistent_loop=None):
+    """Drive an async generator from a plain (sync) generator.
+
+    Flask consumes a streamed response body after the async view has returned.
+    With a PersistentLoop (utils/event_loop.py) each step runs on that shared
+    loop; otherwise the generator gets a private loop for its whole life. The
+    async generator is closed even if the client disconnects.
+    """
+    if persistent_loop is not None:
+        run, close = persistent_loop.run, None
+    else:
+        loop = asyncio.new_event_loop()
+        run, close = loop.run_until_complete, loop.close
+    try:
+        while True:
+            try:
+                yield run(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run(agen.aclose())
+        if close is not None:
+            close()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,137 @@
+# utils/token_cache.py
+"""
+Verified-token cache and logout revocations for protectRoute.
+
+A logout is written to the revoked_token table on DATABASE_URL, so every
+worker and process refuses the token, and to the local RevocationList so
+this one does without asking. A token verified here is cached for at most
+TOKEN_REVOCATION_RECHECK seconds before protectRoute verifies it - and
+looks it up in revoked_token - again; that is the longest another worker
+keeps accepting a token after its logout.
+"""
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import RevokedToken
+from utils.extensions import async_session
+
+
+def token_digest(token):
+    """Cache / revocation key for a raw JWT, so the token itself is never kept around."""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class TokenCache:
+    """Bounded LRU of already-verified tokens: digest -> (user id, valid until).
+
+    An entry is only served for `recheck` seconds and never past the token's
+    own `exp`, after which the token goes through full verification (and the
+    revocation lookup) again.
+    """
+
+    def __init__(self, maxsize, recheck):
+        self.maxsize = maxsize
+        self.recheck = recheck
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, now=None):
+        if not self.maxsize:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def put(self, digest, subject, exp):
+        if not self.maxsize or exp is None:
+            return
+        with self._lock:
+            self._entries[digest] = (subject, min(exp, time.time() + self.recheck))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RevocationList:
+    """This worker's copy of the tokens it knows are revoked, kept only until they would have expired anyway."""
+
+    def __init__(self):
+        self._revoked = {}
+        self._expiry = []           # heap of (exp, digest) for cheap pruning
+        self._lock = threading.Lock()
+
+    def revoke(self, digest, exp):
+        with self._lock:
+            self._prune(time.time())
+            self._revoked[digest] = exp
+            heapq.heappush(self._expiry, (exp, digest))
+
+    def is_revoked(self, digest):
+        # lock-free read on the hot path; dict lookups are atomic
+        return digest in self._revoked
+
+    def _prune(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, digest = heapq.heappop(self._expiry)
+            if self._revoked.get(digest, now + 1) <= now:
+                del self._revoked[digest]
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+def get_token_cache(app):
+    cache = app.extensions.get('token_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('token_cache', TokenCache(
+            app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_REVOCATION_RECHECK']
+        ))
+    return cache
+
+
+def get_revocations(app):
+    revocations = app.extensions.get('token_revocations')
+    if revocations is None:
+        revocations = app.extensions.setdefault('token_revocations', RevocationList())
+    return revocations
+
+
+# ------------------------- SHARED REVOCATIONS -------------------------
+async def store_revocation(digest, exp):
+    """Record a logout in revoked_token for every worker; drops the rows that have expired meanwhile."""
+    now = datetime.utcnow()
+    async with async_session() as session:
+        dialect = session.get_bind().dialect.name
+        stmt = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(RevokedToken)
+        await session.execute(stmt.values(
+            digest=digest, expires_at=datetime.utcfromtimestamp(exp)
+        ).on_conflict_do_nothing(index_elements=['digest']))
+        await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        await session.commit()
+
+
+async def is_revoked_in_database(digest):
+    async with async_session() as session:
+        result = await session.execute(select(RevokedToken.expires_at).where(RevokedToken.digest == digest))
+        return result.scalar_one_or_none() is not None